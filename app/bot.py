@@ -1,18 +1,50 @@
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 
 from app.config import Config
+from app.middlewares.outbound import OutboundScheduler
+from app.storage.fsm import SQLiteStorage
 
 
-def create_bot() -> tuple[Bot, Dispatcher]:
-    storage = MemoryStorage()
+def create_session() -> AiohttpSession:
+    # свой адрес Bot API: локальный telegram-bot-api или фейковый сервер из bench/
+    if Config.TELEGRAM_API_URL:
+        return AiohttpSession(api=TelegramAPIServer.from_base(Config.TELEGRAM_API_URL))
+    return AiohttpSession()
+
+
+def create_bot(db) -> tuple[Bot, Dispatcher]:
+    if Config.FSM_STORAGE == "sqlite":
+        storage = SQLiteStorage(
+            db,
+            state_ttl=Config.FSM_STATE_TTL,
+            cache_size=Config.FSM_CACHE_SIZE,
+            cache_ttl=Config.FSM_CACHE_TTL,
+        )
+    else:
+        storage = MemoryStorage()
+
+    session = create_session()
+
+    outbound = None
+    if Config.OUTBOUND_GLOBAL_RPS > 0:
+        outbound = OutboundScheduler(
+            global_rps=Config.OUTBOUND_GLOBAL_RPS,
+            chat_rps=Config.OUTBOUND_CHAT_RPS,
+            group_rpm=Config.OUTBOUND_GROUP_RPM,
+        )
+        session.middleware(outbound)
 
     bot = Bot(
         token=Config.BOT_TOKEN,
+        session=session,
         default=DefaultBotProperties(parse_mode="HTML"),
     )
 
     dp = Dispatcher(storage=storage)
+    dp["outbound"] = outbound
 
     return bot, dp
@@ -9,7 +9,77 @@ class Config:
     DB_PATH = os.getenv("DB_PATH", "database.db")
     CALLBACK_SECRET = os.getenv("CALLBACK_SECRET", "")
 
+    # SQLite: сколько read-only соединений держать для параллельного чтения (0 — читать через writer)
+    DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+    DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+
+    # Групповой коммит записей (голоса, сохранения, пользователи) — выключен по умолчанию
+    DB_WRITE_BATCHING = os.getenv("DB_WRITE_BATCHING", "0").lower() in ("1", "true", "yes")
+    DB_BATCH_MAX_SIZE = int(os.getenv("DB_BATCH_MAX_SIZE", "64"))
+    DB_BATCH_INTERVAL_MS = float(os.getenv("DB_BATCH_INTERVAL_MS", "5"))
+
+    # Slow-query log: запросы дольше порога (0 — выключен) в лог с планом, сводка раз в REPORT_SEC
+    DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "0"))
+    DB_SLOW_QUERY_REPORT_SEC = float(os.getenv("DB_SLOW_QUERY_REPORT_SEC", "600"))
+
+    # Кэш tg_id → users.id перед UserRepo.get_or_create
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "50000"))
+    USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "600"))
+
+    # Rate-limit: "memory" — в процессе, "sqlite" — общий для процессов на одной базе
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    RATE_LIMIT_SYNC_MS = float(os.getenv("RATE_LIMIT_SYNC_MS", "200"))
+
+    # Кэш готовых карточек и клавиатур по (challenge_id, score)
+    RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "5000"))
+
+    # Сколько секунд переиспользовать собранные ответы inline-режима для одной строки запроса
+    INLINE_CACHE_TTL = float(os.getenv("INLINE_CACHE_TTL", "5"))
+
+    # Сколько карточек топа отрендерить в кэш после старта (0 — без прогрева кэшей)
+    WARMUP_CARDS = int(os.getenv("WARMUP_CARDS", "500"))
+
+    # Окно склейки правок одной карточки, мс (0 — править на каждый голос)
+    EDIT_COALESCE_MS = float(os.getenv("EDIT_COALESCE_MS", "1000"))
+
+    # Bot API: свой сервер (пусто — api.telegram.org) и бюджеты исходящих запросов
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+    OUTBOUND_GLOBAL_RPS = float(os.getenv("OUTBOUND_GLOBAL_RPS", "30"))  # 0 — без планировщика
+    OUTBOUND_CHAT_RPS = float(os.getenv("OUTBOUND_CHAT_RPS", "1"))
+    OUTBOUND_GROUP_RPM = float(os.getenv("OUTBOUND_GROUP_RPM", "20"))
+
+    # FSM: sqlite — состояния в базе (переживают рестарт, общие для процессов) | memory
+    FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite").lower()
+    FSM_STATE_TTL = float(os.getenv("FSM_STATE_TTL", "86400"))  # брошенный диалог забывается через сутки
+    FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+    FSM_CACHE_TTL = float(os.getenv("FSM_CACHE_TTL", "2"))  # насколько кэш может отставать от других процессов
+
+    # Приём апдейтов: polling | webhook; сколько апдейтов обрабатывать одновременно
+    RUN_MODE = os.getenv("RUN_MODE", "polling").lower()
+    UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "64"))
+
+    # Webhook: где слушать, куда Telegram шлёт апдейты (пусто — не регистрировать) и сколько процессов
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+    WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "1"))
+
+    # Супервизор: один процесс принимает апдейты и раздаёт их N воркерам по user_id (0/1 — выключен)
+    SUPERVISOR_WORKERS = int(os.getenv("SUPERVISOR_WORKERS", "0"))
+
+    # Метрики: гистограммы апдейтов и запросов к базе (выключены — инструментирование не подключается),
+    # порт для Prometheus (0 — не слушать; у воркеров — порт + номер) и кому доступна /stats
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+    ADMIN_IDS = {int(x) for x in os.getenv("ADMIN_IDS", "").replace(",", " ").split()}
+
     @classmethod
     def validate(cls):
         if not cls.BOT_TOKEN:
             raise RuntimeError("❌ BOT_TOKEN не найден в .env")
+        if cls.RUN_MODE not in ("polling", "webhook"):
+            raise RuntimeError(f"❌ RUN_MODE должен быть polling или webhook, а не {cls.RUN_MODE!r}")
@@ -0,0 +1,95 @@
+from html import escape
+
+from aiogram import Router, F
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from app.config import Config
+from app.metrics import metrics
+from app.services.stats import runtime_stats
+from app.storage.db import Database
+
+router = Router()
+# остальным пользователям команда не видна: апдейт уходит дальше как необработанный
+router.message.filter(F.from_user.id.in_(Config.ADMIN_IDS))
+
+TOP_STATEMENTS = 8
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}"
+
+
+def _updates_section() -> list[str]:
+    series = metrics.histograms.get("update_seconds", {})
+    lines = ["<b>Апдейты</b> (кол-во, p50 / p95 мс)"]
+    for labels, h in sorted(series.items(), key=lambda item: -item[1].count):
+        name = "/".join(v for _, v in labels if v)
+        lines.append(f"{escape(name)}: {h.count}, {_ms(h.quantile(0.5))} / {_ms(h.quantile(0.95))}")
+    return lines
+
+
+def _db_section() -> list[str]:
+    series = metrics.histograms.get("db_query_seconds", {})
+    rows = metrics.counters.get("db_query_rows_total", {})
+    top = sorted(series.items(), key=lambda item: -item[1].sum)[:TOP_STATEMENTS]
+    lines = [f"<b>База</b> — топ-{TOP_STATEMENTS} операторов по суммарному времени"]
+    for labels, h in top:
+        statement = dict(labels)["statement"]
+        lines.append(
+            f"{h.sum:.2f} с, {h.count}× p95 {_ms(h.quantile(0.95))} мс, "
+            f"строк {int(rows.get(labels, 0))}: <code>{escape(statement)}</code>"
+        )
+    return lines
+
+
+def _slow_section(slowlog) -> list[str]:
+    lines = [f"<b>Медленные запросы</b> (>{slowlog.threshold * 1000:.0f} мс)"]
+    for o in slowlog.top(5):
+        lines.append(
+            f"{o.total:.2f} с, {o.count}×, макс. {o.max * 1000:.0f} мс: <code>{escape(o.sql[:150])}</code>"
+        )
+    return lines
+
+
+def format_stats(stats: dict[str, dict], slowlog=None) -> str:
+    lines = ["📊 <b>Статистика процесса</b>", ""]
+    if metrics.enabled:
+        lines += _updates_section() + [""] + _db_section() + [""]
+    else:
+        lines += ["Гистограммы выключены (METRICS_ENABLED=0)", ""]
+    if slowlog is not None:
+        lines += _slow_section(slowlog) + [""]
+
+    lines.append("<b>Кэши</b> (попадания, размер)")
+    for name, cache in stats["caches"].items():
+        lookups = cache["hits"] + cache["misses"]
+        ratio = f"{cache['hits'] / lookups:.0%}" if lookups else "—"
+        lines.append(f"{name}: {ratio} из {lookups}, {cache['size']}/{cache['maxsize']}")
+
+    c = stats["concurrency"]
+    lines.append("")
+    lines.append(f"<b>Обработка</b>: в работе {c['active']}/{c['limit']}, ждут {c['waiting']}")
+    lines.append(f"<b>Rate-limit</b>: ключей в памяти {stats['ratelimit']['tracked_keys']}")
+    e = stats["coalescer"]
+    lines.append(
+        f"<b>Правки карточек</b>: отправлено {e['sent']}, склеено {e['coalesced']}, "
+        f"пропущено {e['skipped']}, окон открыто {e['open']}"
+    )
+    o = stats.get("outbound")
+    if o is not None:
+        queued = ", ".join(f"{k} {v}" for k, v in o["queued"].items())
+        lines.append(
+            f"<b>Bot API</b>: очередь {queued} (макс. {o['max_depth']}), отправлено {o['sent']}, "
+            f"429: {o['retry_after']}, ожидание {o['avg_wait_ms']} мс"
+        )
+
+    # режем по строкам, чтобы не разорвать HTML-теги; лимит сообщения — 4096 символов
+    while len("\n".join(lines)) > 4096:
+        lines.pop()
+    return "\n".join(lines)
+
+
+@router.message(Command("stats"))
+async def stats_cmd(message: Message, dispatcher, db: Database):
+    await message.answer(format_stats(runtime_stats(dispatcher), db.slowlog))
@@ -32,5 +32,6 @@ async def help_cmd(message: Message):
         "/help — помощь\n"
         "/challenge — получить челлендж\n"
         "/my — список сохранённого\n"
-        "/top — топ челленджей"
+        "/top — топ челленджей\n"
+        "/search — поиск по челленджам"
     )
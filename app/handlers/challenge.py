@@ -1,6 +1,7 @@
+from html import escape
 from math import ceil
 from aiogram import Router, F
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message, CallbackQuery
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
@@ -15,13 +16,14 @@ from app.services.challenge_factory import ensure_challenge
 from app.services.rendering import render_challenge
 from app.services.teleutil import safe_edit_card
 from app.keyboards.challenge import challenge_keyboard, save_decision_keyboard
-from app.keyboards.pagination import pagination_keyboard
+from app.keyboards.pagination import pagination_keyboard, seek_pagination_keyboard
 from app.keyboards.callbacks import (
     decode,
     VotePayload,
     SavePayload,
     SaveNoteDecisionPayload,
     PagePayload,
+    PageSeekPayload,
     NotePayload,
 )
 
@@ -30,6 +32,40 @@ router = Router()
 MAX_NOTE_LEN = 500
 PAGE_SIZE = 10
 
+LIST_TITLES = {
+    "my": "📚 Твои сохранённые",
+    "top": "🏆 Топ челленджей",
+}
+
+VOTE_ACTION_TEXT = {
+    "added": "Голос принят",
+    "changed": "Голос изменён",
+    "removed": "Голос снят",
+}
+
+
+def _list_text(list_id: str, page: int, total_pages: int, rows) -> str:
+    lines = [f"{LIST_TITLES[list_id]} — страница {page}/{total_pages}:"]
+    for cid, title, score, *_ in rows:
+        lines.append(f"• #{cid} {title}  ({score:+d})")
+    return "\n".join(lines)
+
+
+def _seek_keyboard(list_id: str, page: int, total_pages: int, rows):
+    # ключ курсора: top — (score, cid), my — (saved_ts, cid)
+    def key(row):
+        return (row[2], row[0]) if list_id == "top" else (row[3], row[0])
+
+    return seek_pagination_keyboard(list_id, page, total_pages, key(rows[0]), key(rows[-1]))
+
+
+async def _edit_list(cb: CallbackQuery, text: str, reply_markup) -> None:
+    try:
+        await cb.message.edit_text(text, reply_markup=reply_markup, parse_mode="HTML")
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e).lower():
+            raise
+
 
 # /challenge — выдать карточку
 @router.message(Command("challenge"))
@@ -61,24 +97,16 @@ async def my_cmd(message: Message, db: Database):
         username=message.from_user.username or "",
         first_name=message.from_user.first_name or "",
     )
-    srepo = SavedRepo(db)
-    total = await srepo.count_for_user(uid)
+    total, rows = await SavedRepo(db).first_page_with_total(uid, PAGE_SIZE)
     if total == 0:
         await message.answer("Пока пусто. Сохраняй интересные челленджи кнопкой 💾")
         return
 
     total_pages = max(1, ceil(total / PAGE_SIZE))
-    page = 1
-    offset = (page - 1) * PAGE_SIZE
-    rows = await srepo.page_for_user(uid, PAGE_SIZE, offset)
-
-    lines = [f"📚 Твои сохранённые — страница {page}/{total_pages}:"]
-    for cid, title, score in rows:
-        lines.append(f"• #{cid} {title}  ({score:+d})")
 
     await message.answer(
-        "\n".join(lines),
-        reply_markup=pagination_keyboard("my", page, total_pages),
+        _list_text("my", 1, total_pages, rows),
+        reply_markup=_seek_keyboard("my", 1, total_pages, rows),
     )
     await message.answer("📝 Хочешь увидеть заметки по сохранённым челленджам? Введи команду /notes")
 
@@ -86,27 +114,40 @@ async def my_cmd(message: Message, db: Database):
 # /top — топ по сумме голосов (пагинация)
 @router.message(Command("top"))
 async def top_cmd(message: Message, db: Database):
-    crepo = ChallengeRepo(db)
-    total = await crepo.count_all()
+    # первая страница keyset-пагинации топа — та же, что первая по номеру
+    total, _, rows = await ChallengeRepo(db).top_page_with_total(PAGE_SIZE, 1)
     if total == 0:
         await message.answer("Пока нет челленджей.")
         return
 
     total_pages = max(1, ceil(total / PAGE_SIZE))
-    page = 1
-    offset = (page - 1) * PAGE_SIZE
-    rows = await crepo.top_by_score_page(PAGE_SIZE, offset)
-
-    lines = [f"🏆 Топ челленджей — страница {page}/{total_pages}:"]
-    for cid, title, score in rows:
-        lines.append(f"• #{cid} {title}  ({score:+d})")
 
     await message.answer(
-        "\n".join(lines),
-        reply_markup=pagination_keyboard("top", page, total_pages),
+        _list_text("top", 1, total_pages, rows),
+        reply_markup=_seek_keyboard("top", 1, total_pages, rows),
     )
 
 
+# /search <текст> — полнотекстовый поиск по челленджам
+@router.message(Command("search"))
+async def search_cmd(message: Message, command: CommandObject, db: Database):
+    text = (command.args or "").strip()
+    if not text:
+        await message.answer("Напиши, что искать: /search парсер новостей")
+        return
+
+    rows = await ChallengeRepo(db).search(text, limit=PAGE_SIZE)
+    if not rows:
+        await message.answer(f"По запросу «{escape(text)}» ничего не нашлось 🤷")
+        return
+
+    lines = [f"🔎 Найдено по запросу «{escape(text)}»:"]
+    for cid, title, _, _, score in rows:
+        lines.append(f"• #{cid} {title}  ({score:+d})")
+    lines.append("\nОткрыть карточку: в любом чате набери @бота и cid:&lt;номер&gt;")
+    await message.answer("\n".join(lines))
+
+
 # /notes — список заметок пользователя
 @router.message(Command("notes"))
 async def notes_cmd(message: Message, db: Database):
@@ -170,31 +211,20 @@ async def generic_callback(cb: CallbackQuery, db: Database, state: FSMContext):
     # --- Голосование ---
     if kind == "vote":
         payload: VotePayload = parsed["data"]
-        vrepo = VoteRepo(db)
-
-        prev = await vrepo.get_user_vote(uid, payload.cid)
-        if prev == payload.val:
-            await vrepo.delete_vote(uid, payload.cid)
-            action_text = "Голос снят"
-        else:
-            await vrepo.upsert_vote(uid, payload.cid, payload.val)
-            action_text = "Голос принят" if prev is None else "Голос изменён"
-
-        crepo = ChallengeRepo(db)
-        row = await crepo.get_by_id(payload.cid)
-        if not row:
+        result = await VoteRepo(db).toggle(uid, payload.cid, payload.val)
+        if result is None:
             await cb.answer("Челлендж не найден")
             return
-        _, title, body, tags = row
-        score = await vrepo.get_score(payload.cid)
+        action, score, title, body, tags = result
 
+        # ответ на нажатие — сразу; правка карточки может быть отложена и склеена с соседними
+        await cb.answer(VOTE_ACTION_TEXT[action])
         await safe_edit_card(
             cb.bot,
             cb,
             render_challenge(payload.cid, title, body, tags, score),
             challenge_keyboard(payload.cid, score),
         )
-        await cb.answer(action_text)
         return
 
     # --- Нажали «Сохранить» ---
@@ -248,65 +278,63 @@ async def generic_callback(cb: CallbackQuery, db: Database, state: FSMContext):
         vrepo = VoteRepo(db)
         cid, title, body, tags = await ensure_challenge(crepo)
         score = await vrepo.get_score(cid)
+        await cb.answer("Новый челлендж 🎲")
         await safe_edit_card(
             cb.bot,
             cb,
             render_challenge(cid, title, body, tags, score),
             challenge_keyboard(cid, score),
         )
-        await cb.answer("Новый челлендж 🎲")
         return
 
-    # --- Пагинация списков ---
+    # --- Пагинация списков по курсору ---
+    if kind == "page_seek":
+        payload: PageSeekPayload = parsed["data"]
+        backward = payload.direction == "b"
+
+        if payload.list_id == "my":
+            rows = await SavedRepo(db).page_for_user_seek(uid, PAGE_SIZE, payload.key, backward)
+        else:
+            rows = await ChallengeRepo(db).top_by_score_seek(PAGE_SIZE, payload.key, backward)
+
+        if not rows:
+            await cb.answer("Страница пуста", show_alert=False)
+            return
+
+        await _edit_list(
+            cb,
+            _list_text(payload.list_id, payload.page, payload.total_pages, rows),
+            _seek_keyboard(payload.list_id, payload.page, payload.total_pages, rows),
+        )
+        await cb.answer()
+        return
+
+    # --- Пагинация списков по номеру страницы (кнопки старых сообщений) ---
     if kind == "page":
         payload: PagePayload = parsed["data"]
         page = max(1, payload.page)
 
         if payload.list_id == "my":
-            srepo = SavedRepo(db)
-            total = await srepo.count_for_user(uid)
+            total, page, rows = await SavedRepo(db).page_with_total(uid, PAGE_SIZE, page)
             total_pages = max(1, ceil(total / PAGE_SIZE))
-            page = min(page, total_pages)
-            offset = (page - 1) * PAGE_SIZE
-            rows = await srepo.page_for_user(uid, PAGE_SIZE, offset)
-
-            lines = [f"📚 Твои сохранённые — страница {page}/{total_pages}:"]
-            for cid, title, score in rows:
-                lines.append(f"• #{cid} {title}  ({score:+d})")
 
-            try:
-                await cb.message.edit_text(
-                    "\n".join(lines),
-                    reply_markup=pagination_keyboard("my", page, total_pages),
-                    parse_mode="HTML",
-                )
-            except TelegramBadRequest as e:
-                if "message is not modified" not in str(e).lower():
-                    raise
+            await _edit_list(
+                cb,
+                _list_text("my", page, total_pages, rows),
+                pagination_keyboard("my", page, total_pages),
+            )
             await cb.answer()
             return
 
         if payload.list_id == "top":
-            crepo = ChallengeRepo(db)
-            total = await crepo.count_all()
+            total, page, rows = await ChallengeRepo(db).top_page_with_total(PAGE_SIZE, page)
             total_pages = max(1, ceil(total / PAGE_SIZE))
-            page = min(page, total_pages)
-            offset = (page - 1) * PAGE_SIZE
-            rows = await crepo.top_by_score_page(PAGE_SIZE, offset)
-
-            lines = [f"🏆 Топ челленджей — страница {page}/{total_pages}:"]
-            for cid, title, score in rows:
-                lines.append(f"• #{cid} {title}  ({score:+d})")
 
-            try:
-                await cb.message.edit_text(
-                    "\n".join(lines),
-                    reply_markup=pagination_keyboard("top", page, total_pages),
-                    parse_mode="HTML",
-                )
-            except TelegramBadRequest as e:
-                if "message is not modified" not in str(e).lower():
-                    raise
+            await _edit_list(
+                cb,
+                _list_text("top", page, total_pages, rows),
+                pagination_keyboard("top", page, total_pages),
+            )
             await cb.answer()
             return
 
@@ -1,17 +1,35 @@
 from aiogram import Router
 from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+from app.cache import LRUCache
+from app.config import Config
 from app.storage.db import Database
 from app.storage.repositories.challenge_repo import ChallengeRepo
-from app.storage.repositories.vote_repo import VoteRepo
 from app.services.rendering import render_challenge
 from app.keyboards.challenge import challenge_keyboard
 
 router = Router()
 
-@router.inline_query()
-async def inline_handler(iq: InlineQuery, db: Database):
-    query = (iq.query or "").strip()
+SEARCH_PAGE_SIZE = 10
+MAX_SEARCH_OFFSET = 1000
+
+# (строка запроса, offset) → (готовый список результатов, next_offset)
+results_cache = LRUCache(maxsize=1000, ttl=Config.INLINE_CACHE_TTL)
 
+
+def build_result(row) -> InlineQueryResultArticle:
+    cid, title, body, tags, score = row
+    text = render_challenge(cid, title, body, tags, score)
+    return InlineQueryResultArticle(
+        id=str(cid),
+        title=f"Челлендж #{cid}",
+        description=title[:96],
+        input_message_content=InputTextMessageContent(message_text=text, parse_mode="HTML"),
+        reply_markup=challenge_keyboard(cid, score),
+    )
+
+
+async def build_results(db: Database, query: str, offset: int = 0) -> tuple[list[InlineQueryResultArticle], str]:
+    """Возвращает (результаты, next_offset); пустой next_offset — больше страниц нет."""
     # формат "cid:123" — показать конкретный челлендж
     cid = None
     if query.startswith("cid:"):
@@ -21,34 +39,35 @@ async def inline_handler(iq: InlineQuery, db: Database):
             cid = None
 
     crepo = ChallengeRepo(db)
-    vrepo = VoteRepo(db)
-
-    results = []
-
-    async def build_result(row):
-        cid, title, body, tags = row
-        score = await vrepo.get_score(cid)
-        text = render_challenge(cid, title, body, tags, score)
-        return InlineQueryResultArticle(
-            id=str(cid),
-            title=f"Челлендж #{cid}",
-            description=title[:96],
-            input_message_content=InputTextMessageContent(message_text=text, parse_mode="HTML"),
-            reply_markup=challenge_keyboard(cid, score),
-        )
 
     if cid:
-        row = await crepo.get_by_id(cid)
+        row = await crepo.get_card(cid)
         if row:
-            results.append(await build_result(row))
-
-    # если не задан cid, отдаём несколько последних/топовых для выбора
-    if not results:
-        top = await crepo.get_top_by_score(limit=5)
-        # get_top_by_score возвращает (cid, title, score) — дотянем тело
-        for cid, title, _ in top:
-            full = await crepo.get_by_id(cid)
-            if full:
-                results.append(await build_result(full))
-
-    await iq.answer(results=results, is_personal=False, cache_time=5)
+            return [build_result(row)], ""
+
+    # произвольный текст — полнотекстовый поиск с подгрузкой страниц
+    if query and not cid:
+        rows = await crepo.search(query, limit=SEARCH_PAGE_SIZE + 1, offset=offset)
+        has_more = len(rows) > SEARCH_PAGE_SIZE and offset + SEARCH_PAGE_SIZE < MAX_SEARCH_OFFSET
+        next_offset = str(offset + SEARCH_PAGE_SIZE) if has_more else ""
+        return [build_result(row) for row in rows[:SEARCH_PAGE_SIZE]], next_offset
+
+    # пустой запрос — несколько топовых для выбора
+    return [build_result(row) for row in await crepo.top_cards(limit=5)], ""
+
+
+@router.inline_query()
+async def inline_handler(iq: InlineQuery, db: Database):
+    query = (iq.query or "").strip()
+    try:
+        offset = min(max(0, int(iq.offset or 0)), MAX_SEARCH_OFFSET)
+    except ValueError:
+        offset = 0
+
+    cached = results_cache.get((query, offset))
+    if cached is None:
+        cached = await build_results(db, query, offset)
+        results_cache.set((query, offset), cached)
+    results, next_offset = cached
+
+    await iq.answer(results=results, is_personal=False, cache_time=5, next_offset=next_offset)
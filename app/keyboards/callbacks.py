@@ -1,49 +1,66 @@
 import hmac
 import hashlib
-import re
 from dataclasses import dataclass
-from typing import Optional
+from functools import lru_cache
+from typing import Callable
 from app.config import Config
 
 # Формат: cf:1:<type>:...[:sig]
 PREFIX = "cf"
 VERSION = "1"
+NOOP = "cf:noop"
 
 MAX_ID = 2_147_483_647
+# только для страниц по номеру (OFFSET): глубже такие страницы не отдаём.
+# У keyset-страниц номер лишь подпись, их ограничивает MAX_ID
 MAX_PAGE = 10_000
 
 # --- payloads ---
 
-@dataclass
+@dataclass(slots=True)
 class VotePayload:
     cid: int
     val: int  # 1 | -1
 
-@dataclass
+@dataclass(slots=True)
 class SavePayload:
     cid: int
 
-@dataclass
+@dataclass(slots=True)
 class SaveNoteDecisionPayload:
     cid: int
     decision: str  # 'y' | 'n'
 
-@dataclass
+@dataclass(slots=True)
 class PagePayload:
     list_id: str  # "my" | "top"
     page: int
 
-@dataclass
+@dataclass(slots=True)
+class PageSeekPayload:
+    list_id: str  # "my" | "top"
+    direction: str  # 'f' — вперёд после ключа | 'b' — назад перед ключом
+    page: int  # номер страницы, которая откроется
+    total_pages: int  # посчитано при открытии списка, чтобы не пересчитывать на каждом листании
+    key: tuple[int, int]  # top: (score, cid); my: (saved_ts, cid)
+
+@dataclass(slots=True)
 class NotePayload:
     cid: int  # конкретный challenge_id
 
 # --- подпись ---
 
+@lru_cache(maxsize=1)
+def _mac_base(secret: str) -> hmac.HMAC:
+    # ключ HMAC готовим один раз, на каждую подпись — только copy() + update()
+    return hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha1)
+
 def _sign(raw: str) -> str:
     if not Config.CALLBACK_SECRET:
         return ""
-    mac = hmac.new(Config.CALLBACK_SECRET.encode("utf-8"), raw.encode("utf-8"), hashlib.sha1).hexdigest()
-    return mac[:6]
+    mac = _mac_base(Config.CALLBACK_SECRET).copy()
+    mac.update(raw.encode("utf-8"))
+    return mac.hexdigest()[:6]
 
 def _pack(parts: list[str], sign: bool = True) -> str:
     raw = ":".join(parts)
@@ -52,15 +69,6 @@ def _pack(parts: list[str], sign: bool = True) -> str:
         return f"{raw}:{sig}"
     return raw
 
-def _verify(full: str) -> bool:
-    if not Config.CALLBACK_SECRET:
-        return True
-    try:
-        head, sig = full.rsplit(":", 1)
-    except ValueError:
-        return False
-    return hmac.compare_digest(_sign(head), sig)
-
 # --- encoders ---
 
 def encode_vote(challenge_id: int, value: int) -> str:
@@ -75,8 +83,12 @@ def encode_new() -> str:
 def encode_page(list_id: str, page: int) -> str:
     return _pack([PREFIX, VERSION, "p", list_id, str(page)])
 
+def encode_page_seek(list_id: str, direction: str, page: int, total_pages: int, key: tuple[int, int]) -> str:
+    # cf:1:pk:<list>:<f|b>:<page>:<total>:<k1>:<k2> — с подписью укладывается в 64 байта
+    return _pack([PREFIX, VERSION, "pk", list_id, direction, str(page), str(total_pages), str(key[0]), str(key[1])])
+
 def encode_noop() -> str:
-    return "cf:noop"
+    return NOOP
 
 # --- Новые: заметки ---
 
@@ -92,76 +104,134 @@ def encode_note_list() -> str:
     # cf:1:nl
     return _pack([PREFIX, VERSION, "nl"])
 
-# --- decoders (regex для неподписанной части) ---
+# --- decoders: по одному парсеру аргументов на тип ---
 
-VOTE_RE = re.compile(r"^cf:1:v:(-?\d+):(-?1)$")
-SAVE_RE = re.compile(r"^cf:1:s:(-?\d+)$")
-NEW_RE  = re.compile(r"^cf:1:n$")
-PAGE_RE = re.compile(r"^cf:1:p:([a-z]+):(\d+)$")
-SN_RE   = re.compile(r"^cf:1:sn:(-?\d+):(y|n)$")
-NT_RE   = re.compile(r"^cf:1:nt:(-?\d+)$")
-NL_RE   = re.compile(r"^cf:1:nl$")
+def _int(s: str) -> int | None:
+    # ровно -?[0-9]+ — int() принял бы ещё '+', пробелы и '_'
+    if s.isdigit() and s.isascii():
+        return int(s)
+    if s[:1] == "-" and s[1:].isdigit() and s.isascii():
+        return int(s)
+    return None
+
+def _cid(s: str) -> int | None:
+    cid = _int(s)
+    if cid is None or not (-MAX_ID <= cid <= MAX_ID):
+        return None
+    return cid
+
+_VOTE_VALUES = {"1": 1, "-1": -1}
+
+def _parse_vote(args: list[str]):
+    if len(args) != 2:
+        return None
+    val = _VOTE_VALUES.get(args[1])
+    cid = _cid(args[0])
+    if val is None or cid is None:
+        return None
+    return {"type": "vote", "data": VotePayload(cid, val)}
+
+def _parse_save(args: list[str]):
+    if len(args) != 1:
+        return None
+    cid = _cid(args[0])
+    if cid is None:
+        return None
+    return {"type": "save", "data": SavePayload(cid)}
+
+def _parse_save_decision(args: list[str]):
+    if len(args) != 2 or args[1] not in ("y", "n"):
+        return None
+    cid = _cid(args[0])
+    if cid is None:
+        return None
+    return {"type": "save_decision", "data": SaveNoteDecisionPayload(cid, args[1])}
+
+def _parse_new(args: list[str]):
+    return {"type": "new"} if not args else None
+
+def _parse_page(args: list[str]):
+    if len(args) != 2 or args[0] not in ("my", "top") or not args[1].isascii() or not args[1].isdigit():
+        return None
+    page = int(args[1])
+    if page < 1 or page > MAX_PAGE:
+        return None
+    return {"type": "page", "data": PagePayload(args[0], page)}
+
+def _parse_page_seek(args: list[str]):
+    if len(args) != 6 or args[0] not in ("my", "top") or args[1] not in ("f", "b"):
+        return None
+    page, total_pages = _int(args[2]), _int(args[3])
+    k1, k2 = _cid(args[4]), _cid(args[5])
+    if page is None or total_pages is None or k1 is None or k2 is None:
+        return None
+    if not (1 <= page <= total_pages <= MAX_ID):
+        return None
+    return {
+        "type": "page_seek",
+        "data": PageSeekPayload(args[0], args[1], page, total_pages, (k1, k2)),
+    }
+
+def _parse_note(args: list[str]):
+    if len(args) != 1:
+        return None
+    cid = _cid(args[0])
+    if cid is None:
+        return None
+    return {"type": "note", "data": NotePayload(cid)}
+
+def _parse_note_list(args: list[str]):
+    return {"type": "note_list"} if not args else None
+
+# токен типа из callback_data → парсер остальных полей
+_PARSERS: dict[str, Callable[[list[str]], dict | None]] = {
+    "v": _parse_vote,
+    "s": _parse_save,
+    "sn": _parse_save_decision,
+    "n": _parse_new,
+    "p": _parse_page,
+    "pk": _parse_page_seek,
+    "nt": _parse_note,
+    "nl": _parse_note_list,
+}
+
+# токен типа → вид кнопки, как в decode(...)["type"]
+_KINDS = {
+    "v": "vote",
+    "s": "save",
+    "sn": "save_decision",
+    "n": "new",
+    "p": "page",
+    "pk": "page_seek",
+    "nt": "note",
+    "nl": "note_list",
+}
+
+def callback_kind(data: str) -> str:
+    """Вид кнопки по префиксу callback_data — без разбора полей и проверки подписи (метки метрик)."""
+    if data == NOOP:
+        return "noop"
+    parts = data.split(":", 3)
+    if len(parts) < 3 or parts[0] != PREFIX or parts[1] != VERSION:
+        return "invalid"
+    return _KINDS.get(parts[2], "invalid")
 
 def decode(data: str):
-    if data == "cf:noop":
+    if data == NOOP:
         return {"type": "noop"}
 
-    # подпись
+    # подпись: отделяем и проверяем один раз
     if Config.CALLBACK_SECRET:
-        try:
-            head, sig = data.rsplit(":", 1)
-        except ValueError:
-            return None
-        if not _verify(data):
+        head, sep, sig = data.rpartition(":")
+        if not sep or not hmac.compare_digest(_sign(head), sig):
             return None
-        payload = head
     else:
-        payload = data
-
-    m = VOTE_RE.match(payload)
-    if m:
-        cid = int(m.group(1))
-        val = int(m.group(2))
-        if not (-MAX_ID <= cid <= MAX_ID):
-            return None
-        return {"type": "vote", "data": VotePayload(cid=cid, val=val)}
-
-    m = SAVE_RE.match(payload)
-    if m:
-        cid = int(m.group(1))
-        if not (-MAX_ID <= cid <= MAX_ID):
-            return None
-        return {"type": "save", "data": SavePayload(cid=cid)}
-
-    m = SN_RE.match(payload)
-    if m:
-        cid = int(m.group(1))
-        decision = m.group(2)
-        if not (-MAX_ID <= cid <= MAX_ID):
-            return None
-        return {"type": "save_decision", "data": SaveNoteDecisionPayload(cid=cid, decision=decision)}
-
-    if NEW_RE.match(payload):
-        return {"type": "new"}
-
-    m = PAGE_RE.match(payload)
-    if m:
-        list_id = m.group(1)
-        page = int(m.group(2))
-        if page < 1 or page > MAX_PAGE:
-            return None
-        if list_id not in ("my", "top"):
-            return None
-        return {"type": "page", "data": PagePayload(list_id=list_id, page=page)}
-
-    m = NT_RE.match(payload)
-    if m:
-        cid = int(m.group(1))
-        if not (-MAX_ID <= cid <= MAX_ID):
-            return None
-        return {"type": "note", "data": NotePayload(cid=cid)}
-
-    if NL_RE.match(payload):
-        return {"type": "note_list"}
-
-    return None
+        head = data
+
+    parts = head.split(":")
+    if len(parts) < 3 or parts[0] != PREFIX or parts[1] != VERSION:
+        return None
+    parser = _PARSERS.get(parts[2])
+    if parser is None:
+        return None
+    return parser(parts[3:])
@@ -1,4 +1,6 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from app.cache import LRUCache
+from app.config import Config
 from app.keyboards.callbacks import (
     encode_vote,
     encode_save,
@@ -8,6 +10,10 @@ from app.keyboards.callbacks import (
     encode_note_list,
 )
 
+# (challenge_id, score) → готовая клавиатура; объекты не мутируются, их можно переиспользовать
+keyboard_cache = LRUCache(maxsize=Config.RENDER_CACHE_SIZE)
+
+
 def challenge_keyboard(challenge_id: int, score: int) -> InlineKeyboardMarkup:
     """
     Основная клавиатура под карточкой челленджа:
@@ -15,6 +21,13 @@ def challenge_keyboard(challenge_id: int, score: int) -> InlineKeyboardMarkup:
     💾 Сохранить | 🎲 Ещё
     📝 Заметки | 📤 Поделиться
     """
+    return keyboard_cache.get_or_build(
+        (challenge_id, score),
+        lambda: _build_challenge_keyboard(challenge_id, score),
+    )
+
+
+def _build_challenge_keyboard(challenge_id: int, score: int) -> InlineKeyboardMarkup:
     row1 = [
         InlineKeyboardButton(text="👍", callback_data=encode_vote(challenge_id, 1)),
         InlineKeyboardButton(text=f"{score:+d}", callback_data=encode_noop()),
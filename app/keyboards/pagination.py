@@ -1,5 +1,5 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from app.keyboards.callbacks import encode_page, encode_noop
+from app.keyboards.callbacks import encode_page, encode_page_seek, encode_noop
 
 def pagination_keyboard(list_id: str, page: int, total_pages: int) -> InlineKeyboardMarkup:
     buttons = []
@@ -16,3 +16,36 @@ def pagination_keyboard(list_id: str, page: int, total_pages: int) -> InlineKeyb
         buttons.append(InlineKeyboardButton(text=" ", callback_data=encode_noop()))
 
     return InlineKeyboardMarkup(inline_keyboard=[buttons])
+
+
+def seek_pagination_keyboard(
+    list_id: str,
+    page: int,
+    total_pages: int,
+    first_key: tuple[int, int],
+    last_key: tuple[int, int],
+) -> InlineKeyboardMarkup:
+    """
+    Пагинация по курсору: «Назад» несёт ключ первой строки страницы,
+    «Вперёд» — ключ последней.
+    """
+    buttons = []
+    if page > 1:
+        buttons.append(InlineKeyboardButton(
+            text="⟨ Назад",
+            callback_data=encode_page_seek(list_id, "b", page - 1, total_pages, first_key),
+        ))
+    else:
+        buttons.append(InlineKeyboardButton(text=" ", callback_data=encode_noop()))
+
+    buttons.append(InlineKeyboardButton(text=f"Стр. {page}/{total_pages}", callback_data=encode_noop()))
+
+    if page < total_pages:
+        buttons.append(InlineKeyboardButton(
+            text="Вперёд ⟩",
+            callback_data=encode_page_seek(list_id, "f", page + 1, total_pages, last_key),
+        ))
+    else:
+        buttons.append(InlineKeyboardButton(text=" ", callback_data=encode_noop()))
+
+    return InlineKeyboardMarkup(inline_keyboard=[buttons])
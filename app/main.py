@@ -1,35 +1,172 @@
 import asyncio
+import multiprocessing
+import signal
 from loguru import logger
 
 from app.logger_config import setup_logging
 from app.config import Config
-from app.bot import create_bot
-from app.handlers.base import router as base_router
-from app.handlers.inline import router as inline_router
-from app.handlers.challenge import router as challenge_router
 from app.storage.db import Database
-from app.middlewares.ratelimit import RateLimitMiddleware
+from app.metrics import metrics  # без aiogram; его всё равно импортирует app.storage.db
+# Всё, что тянет aiogram (бот, хэндлеры, middleware, прогрев), и режимные модули
+# (webhook, супервизор, сервер метрик) импортируются там, где нужны: родителю супервизора
+# они не нужны, его воркеры получают их из предзагрузки forkserver.
 
-async def main():
-    setup_logging()
-    Config.validate()
 
-    db = Database(Config.DB_PATH)
-    await db.connect()
+def _routers():
+    from app.handlers.admin import router as admin_router
+    from app.handlers.base import router as base_router
+    from app.handlers.challenge import router as challenge_router
+    from app.handlers.inline import router as inline_router
+
+    return admin_router, base_router, challenge_router, inline_router
 
-    bot, dp = create_bot()
+
+def build_dispatcher(db: Database, worker: int = 0):
+    from app.bot import create_bot
+    from app.middlewares.concurrency import ConcurrencyLimitMiddleware
+    from app.middlewares.ratelimit import RateLimitMiddleware, rate_limit_backend
+
+    bot, dp = create_bot(db)
     dp["db"] = db
 
-    dp.message.middleware(RateLimitMiddleware(window_sec=10, max_actions=5, kinds=("message",)))
-    dp.callback_query.middleware(RateLimitMiddleware(window_sec=10, max_actions=8, kinds=("callback",)))
+    dp["concurrency"] = ConcurrencyLimitMiddleware(Config.UPDATE_CONCURRENCY)
+    dp.update.outer_middleware(dp["concurrency"])
+    dp["metrics_server"] = None
+    if metrics.enabled:
+        from app.metrics import flatten_stats
+        from app.middlewares.metrics import MetricsMiddleware
+        from app.services.stats import runtime_stats
+
+        dp.update.outer_middleware(MetricsMiddleware())
+        metrics.add_collector(lambda: flatten_stats(runtime_stats(dp)))
+    dp["warmup"] = None
+    dp["worker"] = worker
+    dp.startup.register(_start_warmup)
+
+    backend = rate_limit_backend(db)
+    rate_limits = [
+        RateLimitMiddleware(window_sec=10, max_actions=5, kinds=("message",), backend=backend),
+        RateLimitMiddleware(window_sec=10, max_actions=8, kinds=("callback",), backend=backend),
+    ]
+    dp.message.middleware(rate_limits[0])
+    dp.callback_query.middleware(rate_limits[1])
+    dp["rate_limits"] = rate_limits
+
+    for router in _routers():
+        dp.include_router(router)
+
+    return bot, dp
+
+
+async def _start_warmup(dispatcher, db: Database):
+    # startup шлют start_polling и webhook-приложение; прогрев идёт параллельно с приёмом апдейтов
+    if Config.WARMUP_CARDS > 0:
+        # кэш страниц ОС общий для процессов — чтение с диска только в воркере 0
+        from app.services.warmup import warm_caches
+
+        prefetch = dispatcher["worker"] == 0
+        dispatcher["warmup"] = asyncio.create_task(warm_caches(db, Config.WARMUP_CARDS, prefetch))
+
+
+async def start_metrics(dp, port_offset: int = 0):
+    # у нескольких процессов — свой порт на каждый: METRICS_PORT + номер воркера
+    if metrics.enabled and Config.METRICS_PORT:
+        from app.metrics import start_metrics_server
+
+        dp["metrics_server"] = await start_metrics_server(Config.METRICS_HOST, Config.METRICS_PORT + port_offset)
+
+
+async def shutdown(dp, db: Database):
+    if dp["warmup"] is not None:
+        dp["warmup"].cancel()
+    if dp["metrics_server"] is not None:
+        await dp["metrics_server"].cleanup()
+    for middleware in dp["rate_limits"]:
+        await middleware.close()
+    if dp["outbound"] is not None:
+        await dp["outbound"].close()
+    await dp.storage.close()
+    await db.close()
 
-    dp.include_router(base_router)
-    dp.include_router(challenge_router)
-    dp.include_router(inline_router)
+
+async def run(worker: int = 0):
+    db = Database(Config.DB_PATH)
+    await db.connect()
+
+    bot, dp = build_dispatcher(db, worker)
 
     logger.info("Бот запущен ✅")
-    await dp.start_polling(bot)
+    try:
+        await start_metrics(dp, worker)
+        if Config.RUN_MODE == "webhook":
+            from app.webhook import run_webhook
+
+            # webhook у Telegram регистрирует один процесс, слушают порт все
+            await run_webhook(bot, dp, set_webhook=worker == 0, reuse_port=Config.WEBHOOK_WORKERS > 1)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        await shutdown(dp, db)
+
+
+def _worker(index: int):
+    setup_logging()
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    # общий бюджет Bot API делится между процессами, как в режиме супервизора
+    Config.OUTBOUND_GLOBAL_RPS /= Config.WEBHOOK_WORKERS
+    try:
+        asyncio.run(run(index))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _migrate():
+    db = Database(Config.DB_PATH)
+    await db.connect(migrate_only=True)
+    await db.close()
+
+
+def main():
+    setup_logging()
+    Config.validate()
+    # SIGTERM завершает так же аккуратно, как Ctrl+C (polling ставит свои обработчики сам)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    if Config.SUPERVISOR_WORKERS > 1:
+        from app.supervisor import run_supervisor
+
+        asyncio.run(_migrate())
+        run_supervisor(Config.SUPERVISOR_WORKERS)
+        return
+
+    if Config.RUN_MODE != "webhook" or Config.WEBHOOK_WORKERS <= 1:
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            pass
+        return
+
+    # миграции — один раз до старта воркеров, чтобы процессы не гонялись за ALTER TABLE
+    asyncio.run(_migrate())
+    # импорт до fork: воркеры наследуют загруженные модули, а не импортируют aiogram каждый сам
+    import app.webhook  # noqa: F401
+    _routers()
+    workers = [
+        multiprocessing.Process(target=_worker, args=(i,), name=f"webhook-{i}")
+        for i in range(Config.WEBHOOK_WORKERS)
+    ]
+    for process in workers:
+        process.start()
+    logger.info(f"Запущено webhook-воркеров: {len(workers)}")
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -0,0 +1,207 @@
+"""
+Метрики процесса в памяти: гистограммы задержек и счётчики, текстовый формат Prometheus.
+При METRICS_ENABLED=0 инструментирование не подключается вовсе — ни middleware, ни обёрток запросов.
+"""
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Callable, Iterable
+
+from loguru import logger
+
+from app.config import Config
+
+# границы корзин гистограмм, секунды
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+Labels = tuple[tuple[str, str], ...]
+# коллектор отдаёт мгновенные значения (gauge) на момент запроса: (имя, метки, значение)
+Collector = Callable[[], Iterable[tuple[str, Labels, float]]]
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # последняя корзина — +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля линейной интерполяцией внутри корзины (как histogram_quantile)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]
+                lo = BUCKETS[i - 1] if i else 0.0
+                return lo + (BUCKETS[i] - lo) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+class Metrics:
+    def __init__(self, enabled: bool, prefix: str = "challengeforge"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+        self.counters: dict[str, dict[Labels, float]] = {}
+        self._collectors: list[Collector] = []
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        series = self.histograms.setdefault(name, {})
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram()
+        histogram.observe(value)
+
+    def inc(self, name: str, labels: Labels, value: float = 1) -> None:
+        series = self.counters.setdefault(name, {})
+        series[labels] = series.get(labels, 0) + value
+
+    def add_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for name, series in sorted(self.counters.items()):
+            full = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {full} counter")
+            for labels, value in series.items():
+                lines.append(f"{full}{_format_labels(labels)} {value}")
+
+        for name, series in sorted(self.histograms.items()):
+            full = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {full} histogram")
+            for labels, h in series.items():
+                cumulative = 0
+                for bound, n in zip(BUCKETS + ("+Inf",), h.counts):
+                    cumulative += n
+                    lines.append(f"{full}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{full}_sum{_format_labels(labels)} {h.sum}")
+                lines.append(f"{full}_count{_format_labels(labels)} {h.count}")
+
+        gauges: dict[str, list[tuple[Labels, float]]] = {}
+        for collector in self._collectors:
+            try:
+                for name, labels, value in collector():
+                    gauges.setdefault(name, []).append((labels, value))
+            except Exception:
+                logger.exception("Ошибка коллектора метрик")
+        for name, series in sorted(gauges.items()):
+            full = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {full} gauge")
+            for labels, value in series:
+                lines.append(f"{full}{_format_labels(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def flatten_stats(stats: dict[str, dict]) -> Iterable[tuple[str, Labels, float]]:
+    """
+    Словари stats() компонентов → gauge:
+    {"outbound": {"sent": 5}}                → outbound_sent
+    {"outbound": {"queued": {"edit": 2}}}    → outbound_queued{name="edit"}
+    {"caches": {"cards": {"hits": 10}}}      → caches_hits{name="cards"} (все значения — словари)
+    """
+    for section, fields in stats.items():
+        if fields and all(isinstance(v, dict) for v in fields.values()):
+            for name, record in fields.items():
+                for key, value in record.items():
+                    if isinstance(value, (int, float)):
+                        yield f"{section}_{key}", (("name", name),), value
+            continue
+        for key, value in fields.items():
+            if isinstance(value, dict):
+                for name, v in value.items():
+                    if isinstance(v, (int, float)):
+                        yield f"{section}_{key}", (("name", name),), v
+            elif isinstance(value, (int, float)):
+                yield f"{section}_{key}", (), value
+
+
+@lru_cache(maxsize=1024)
+def statement_label(query: str) -> str:
+    """SQL без лишних пробелов и переносов, обрезанный — метка для метрик запросов."""
+    statement = " ".join(query.split())
+    return statement if len(statement) <= 120 else statement[:117] + "..."
+
+
+def _rows(result) -> int:
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple):
+        return 1
+    # курсор или WriteResult; у SELECT rowcount = -1
+    return max(getattr(result, "rowcount", 0), 0)
+
+
+def timed_query(fn, op: str):
+    """Оборачивает метод Database: время и число строк по каждому оператору."""
+    async def wrapper(query: str, params: tuple = ()):
+        labels = (("op", op), ("statement", statement_label(query)))
+        started = time.perf_counter()
+        try:
+            result = await fn(query, params)
+        except Exception:
+            metrics.inc("db_query_errors_total", labels)
+            raise
+        finally:
+            metrics.observe("db_query_seconds", labels, time.perf_counter() - started)
+        metrics.inc("db_query_rows_total", labels, _rows(result))
+        return result
+    return wrapper
+
+
+def timed_run(fn):
+    """Оборачивает Database.run: блок операторов — одна запись, метка — имя переданной функции."""
+    async def wrapper(block, *args, write: bool = False):
+        labels = (("op", "run_write" if write else "run"), ("statement", block.__qualname__))
+        started = time.perf_counter()
+        try:
+            return await fn(block, *args, write=write)
+        except Exception:
+            metrics.inc("db_query_errors_total", labels)
+            raise
+        finally:
+            metrics.observe("db_query_seconds", labels, time.perf_counter() - started)
+    return wrapper
+
+
+async def start_metrics_server(host: str, port: int):
+    # aiohttp.web нужен только с METRICS_PORT — не грузим его на каждом старте
+    from aiohttp import web
+
+    async def metrics_handler(request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Метрики Prometheus: http://{host}:{port}/metrics")
+    return runner
+
+
+metrics = Metrics(enabled=Config.METRICS_ENABLED)
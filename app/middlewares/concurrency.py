@@ -0,0 +1,36 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """
+    Не больше limit апдейтов обрабатываются одновременно, остальные ждут.
+    Вешается на dp.update как outer-middleware: и polling (handle_as_tasks), и webhook
+    (handle_in_background) иначе запускают по задаче на каждый апдейт без ограничений.
+    """
+    def __init__(self, limit: int = 64):
+        super().__init__()
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+
+    async def __call__(self,
+                       handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+                       event: Update,
+                       data: Dict[str, Any]) -> Any:
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            return await handler(event, data)
+        finally:
+            self.active -= 1
+            self._semaphore.release()
@@ -0,0 +1,35 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from app.keyboards.callbacks import callback_kind
+from app.metrics import metrics
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Время обработки апдейта по типу (message, callback_query, inline_query...)
+    и для callback — по виду кнопки (callback_kind, те же имена, что decode(...)["type"]).
+    Вешается на dp.update после ConcurrencyLimitMiddleware: ожидание слота не считается.
+    """
+    async def __call__(self,
+                       handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+                       event: Update,
+                       data: Dict[str, Any]) -> Any:
+        labels = _labels(event)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            metrics.inc("update_errors_total", labels)
+            raise
+        finally:
+            metrics.observe("update_seconds", labels, time.perf_counter() - started)
+
+
+def _labels(event: Update) -> tuple[tuple[str, str], ...]:
+    # вид кнопки — по префиксу: подпись проверит обработчик, метке она не нужна
+    kind = callback_kind(event.callback_query.data or "") if event.callback_query is not None else ""
+    return (("type", event.event_type), ("kind", kind))
@@ -0,0 +1,309 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    AnswerCallbackQuery,
+    AnswerInlineQuery,
+    SendMessage,
+    EditMessageText,
+    EditMessageReplyMarkup,
+    DeleteMessage,
+)
+from loguru import logger
+
+
+# Классы приоритета: меньше — раньше. Методы не из списка (getUpdates, getMe, ...)
+# идут в API напрямую, мимо очереди.
+PRIORITIES = {
+    AnswerCallbackQuery: 0,  # «часики» на кнопке — пользователь ждёт прямо сейчас
+    AnswerInlineQuery: 0,
+    SendMessage: 1,
+    EditMessageText: 2,  # карточки и листание списков могут подождать
+    EditMessageReplyMarkup: 2,
+    DeleteMessage: 2,
+}
+PRIORITY_NAMES = ("answer", "send", "edit")
+
+
+class TokenBucket:
+    """rate — токенов в секунду; rate <= 0 — без ограничения (остаётся только пауза после 429)."""
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0.0  # пауза после 429 retry_after
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def ready_at(self, now: float) -> float:
+        """Когда можно будет взять токен (now — уже можно)."""
+        if self.rate <= 0:
+            return max(now, self.blocked_until)
+        self._refill(now)
+        at = now if self.tokens >= 1 else now + (1 - self.tokens) / self.rate
+        return max(at, self.blocked_until)
+
+    def take(self, now: float):
+        if self.rate <= 0:
+            return
+        self._refill(now)
+        self.tokens -= 1
+
+    def idle(self, now: float) -> bool:
+        if self.rate <= 0:
+            return self.blocked_until <= now
+        self._refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+
+class _Outgoing:
+    __slots__ = ("make_request", "bot", "method", "priority", "chat", "future", "enqueued", "attempts")
+
+    def __init__(self, make_request, bot, method, priority: int, chat, future, enqueued: float):
+        self.make_request = make_request
+        self.bot = bot
+        self.method = method
+        self.priority = priority
+        self.chat = chat
+        self.future = future
+        self.enqueued = enqueued
+        self.attempts = 0
+
+
+def _chat_key(method):
+    # у правок inline-сообщений нет chat_id — лимит считаем на само сообщение
+    chat_id = getattr(method, "chat_id", None)
+    if chat_id is not None:
+        return chat_id
+    return getattr(method, "inline_message_id", None)
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """
+    Единая очередь исходящих запросов к Bot API (session middleware).
+    - общий бюджет global_rps на отправки и правки сообщений;
+    - бюджет на чат: chat_rps в личке, group_rpm в группах (chat_id < 0);
+    - из готовых к отправке сначала уходит более приоритетный класс (см. PRIORITIES);
+      чат, исчерпавший свой бюджет, не задерживает остальные;
+    - TelegramRetryAfter ставит на паузу чат (или весь бот) и повторяет запрос до max_retries раз.
+    """
+    BURST = 3  # сколько запросов подряд чат может отправить без паузы
+
+    def __init__(self,
+                 global_rps: float = 30,
+                 chat_rps: float = 1,
+                 group_rpm: float = 20,
+                 max_retries: int = 3):
+        self.chat_rps = chat_rps
+        self.group_rps = group_rpm / 60
+        self.max_retries = max_retries
+
+        self._global = TokenBucket(global_rps, global_rps, time.monotonic())
+        self._chats: dict = {}
+        # ответы — одна очередь; сообщения и правки — по очереди на чат в каждом классе
+        # и куча (когда чат сможет отправить, порядковый номер, чат): выбор не перебирает
+        # все ожидающие запросы, даже если половина чатов стоит на паузе после 429
+        self._answers: deque[_Outgoing] = deque()
+        self._pending: list[dict] = [{} for _ in PRIORITY_NAMES]
+        self._ready: list[list] = [[] for _ in PRIORITY_NAMES]
+        self._queued = [0] * len(PRIORITY_NAMES)
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._inflight: set[asyncio.Task] = set()
+
+        self.sent = 0
+        self.retry_after = 0
+        self.max_depth = 0
+        self.wait_seconds = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._answers) + sum(self._queued[1:])
+
+    def stats(self) -> dict:
+        queued = [len(self._answers), *self._queued[1:]]
+        return {
+            "queued": dict(zip(PRIORITY_NAMES, queued)),
+            "max_depth": self.max_depth,
+            "inflight": len(self._inflight),
+            "sent": self.sent,
+            "retry_after": self.retry_after,
+            "avg_wait_ms": round(self.wait_seconds / self.sent * 1000, 2) if self.sent else 0.0,
+        }
+
+    async def __call__(self, make_request, bot, method):
+        priority = PRIORITIES.get(type(method))
+        if priority is None:
+            return await make_request(bot, method)
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        now = time.monotonic()
+        item = _Outgoing(make_request, bot, method, priority, _chat_key(method), future, now)
+        self._enqueue(item, now)
+        self.max_depth = max(self.max_depth, self.depth)
+        self._wakeup.set()
+        return await item.future
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        while self._answers:
+            self._answers.popleft().future.cancel()
+        for chats in self._pending:
+            for queue in chats.values():
+                for item in queue:
+                    item.future.cancel()
+            chats.clear()
+        for heap in self._ready:
+            heap.clear()
+        self._queued = [0] * len(PRIORITY_NAMES)
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    def _chat_bucket(self, chat, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat)
+        if bucket is None:
+            group = isinstance(chat, int) and chat < 0
+            bucket = TokenBucket(self.group_rps if group else self.chat_rps, self.BURST, now)
+            self._chats[chat] = bucket
+        return bucket
+
+    def _enqueue(self, item: _Outgoing, now: float, front: bool = False):
+        if item.priority == 0:
+            if front:
+                self._answers.appendleft(item)
+            else:
+                self._answers.append(item)
+            return
+
+        self._queued[item.priority] += 1
+        chats = self._pending[item.priority]
+        queue = chats.get(item.chat)
+        if queue is None:
+            # чат с непустой очередью класса всегда ровно один раз лежит в куче этого класса
+            chats[item.chat] = queue = deque()
+            self._schedule(item.priority, item.chat, self._chat_bucket(item.chat, now).ready_at(now))
+        if front:
+            queue.appendleft(item)
+        else:
+            queue.append(item)
+
+    def _schedule(self, priority: int, chat, at: float):
+        heapq.heappush(self._ready[priority], (at, next(self._seq), chat))
+
+    def _pick(self, now: float):
+        """Следующий запрос, который можно отправить сейчас, или (None, сколько ждать)."""
+        # ответы на нажатия и inline-запросы не сообщения — в бюджеты не входят,
+        # ждут только паузу после 429
+        answers = self._answers
+        while answers and answers[0].future.done():
+            answers.popleft()
+        if answers:
+            if self._global.blocked_until <= now:
+                return answers.popleft(), None
+            return None, self._global.blocked_until - now
+
+        ready_at = self._global.ready_at(now)
+        if ready_at > now:
+            return None, ready_at - now
+
+        wait = None
+        for priority in range(1, len(PRIORITY_NAMES)):
+            heap, chats = self._ready[priority], self._pending[priority]
+            while heap:
+                at, _, chat = heap[0]
+                if at > now:
+                    wait = at - now if wait is None else min(wait, at - now)
+                    break
+                heapq.heappop(heap)
+
+                queue = chats[chat]
+                while queue and queue[0].future.done():  # вызывающий уже не ждёт (отменён)
+                    queue.popleft()
+                    self._queued[priority] -= 1
+                if not queue:
+                    del chats[chat]
+                    continue
+
+                # время в куче могло устареть: токены чата взял другой класс или пришёл 429
+                bucket = self._chat_bucket(chat, now)
+                at = bucket.ready_at(now)
+                if at > now:
+                    self._schedule(priority, chat, at)
+                    continue
+
+                item = queue.popleft()
+                self._queued[priority] -= 1
+                bucket.take(now)
+                if queue:
+                    self._schedule(priority, chat, bucket.ready_at(now))
+                else:
+                    del chats[chat]
+                return item, None
+        return None, wait
+
+    def _sweep_chats(self, now: float):
+        # очередь пуста — полные бакеты ничем не отличаются от новых
+        for chat in [c for c, b in self._chats.items() if b.idle(now)]:
+            del self._chats[chat]
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            item, wait = self._pick(now)
+            if item is not None:
+                if item.priority:
+                    self._global.take(now)
+                self.wait_seconds += now - item.enqueued
+                task = asyncio.create_task(self._send(item))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+                continue
+
+            if wait is None:
+                self._sweep_chats(now)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, item: _Outgoing):
+        try:
+            result = await item.make_request(item.bot, item.method)
+        except TelegramRetryAfter as e:
+            self.retry_after += 1
+            now = time.monotonic()
+            bucket = self._global if item.chat is None else self._chat_bucket(item.chat, now)
+            bucket.blocked_until = max(bucket.blocked_until, now + e.retry_after)
+            logger.warning(f"Flood control: {type(item.method).__name__} в {item.chat}, пауза {e.retry_after} с")
+
+            if item.attempts < self.max_retries and not item.future.done():
+                item.attempts += 1
+                self._enqueue(item, now, front=True)
+                self._wakeup.set()
+            elif not item.future.done():
+                item.future.set_exception(e)
+        except Exception as e:
+            if not item.future.done():
+                item.future.set_exception(e)
+        else:
+            self.sent += 1
+            if not item.future.done():
+                item.future.set_result(result)
@@ -1,9 +1,161 @@
+import asyncio
+import json
 import time
-from collections import defaultdict, deque
-from typing import Any, Callable, Awaitable, Dict, Deque, Tuple
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Awaitable, Dict, Tuple
 
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
+from loguru import logger
+
+from app.config import Config
+
+
+class RateLimitBackend(ABC):
+    """
+    Хранилище состояния лимитера. hit() вызывается на каждое событие,
+    поэтому должен отвечать из памяти, без обращения к БД.
+    """
+    @abstractmethod
+    def hit(self, key: int, now: float) -> bool:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Сколько ключей сейчас хранится."""
+
+    async def close(self) -> None:
+        pass
+
+
+# (kind, window_sec, max_actions) → бэкенд для одного типа событий
+BackendFactory = Callable[[str, float, int], RateLimitBackend]
+
+
+class GCRALimiter(RateLimitBackend):
+    """
+    GCRA (generic cell rate algorithm): на ключ хранится одно число — TAT,
+    «теоретическое время прибытия» следующего события.
+    Пропускает до max_actions событий подряд, дальше — одно раз в window_sec / max_actions.
+
+    Ключи лежат в порядке последнего обновления, поэтому «остывшие» (TAT уже в прошлом —
+    такой ключ неотличим от нового) всегда в начале: каждое событие снимает
+    не больше sweep_batch из них, и память не растёт с числом когда-либо писавших пользователей.
+    """
+    def __init__(self, window_sec: float, max_actions: int, sweep_batch: int = 8):
+        self.interval = window_sec / max_actions
+        self.tolerance = window_sec - self.interval
+        self.sweep_batch = sweep_batch
+        self._tat: OrderedDict[int, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def hit(self, key: int, now: float) -> bool:
+        """True — событие пропущено и учтено, False — лимит превышен."""
+        self._sweep(now)
+
+        tat = self._tat.get(key, now)
+        if tat < now:
+            tat = now
+        if tat - now > self.tolerance:
+            return False
+
+        self._tat[key] = tat + self.interval
+        self._tat.move_to_end(key)
+        return True
+
+    def _sweep(self, now: float) -> None:
+        tat = self._tat
+        for _ in range(self.sweep_batch):
+            if not tat:
+                return
+            key, value = next(iter(tat.items()))
+            if value > now:
+                return
+            del tat[key]
+
+
+class SQLiteGCRALimiter(GCRALimiter):
+    """
+    GCRA с общим для нескольких процессов состоянием в таблице ratelimit.
+
+    Решение принимается по локальной копии, как в GCRALimiter. Пропущенные события
+    копятся и раз в sync_interval уходят в базу одним атомарным UPSERT; в ответ
+    процесс забирает общий TAT этих ключей (с учётом событий других процессов).
+    Лимит держится с точностью до одного интервала синхронизации.
+    """
+    CLEANUP_EVERY = 300  # синхронизаций между чистками остывших строк
+
+    def __init__(self, db, kind: str, window_sec: float, max_actions: int, sync_interval: float = 0.2):
+        super().__init__(window_sec, max_actions)
+        self.db = db
+        self.kind = kind
+        self.sync_interval = sync_interval
+        self._pending: dict[int, int] = {}
+        self._task: asyncio.Task | None = None
+        self._syncs = 0
+
+    def hit(self, key: int, now: float) -> bool:
+        if self._task is None:
+            self._task = asyncio.create_task(self._sync_loop())
+
+        if not super().hit(key, now):
+            return False
+        self._pending[key] = self._pending.get(key, 0) + 1
+        return True
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self._sync(time.time())
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self._sync(time.time())
+            except Exception:
+                logger.exception("Не удалось синхронизировать rate-limit с базой")
+
+    async def _sync(self, now: float):
+        if self._syncs % self.CLEANUP_EVERY == 0:
+            await self.db.execute("DELETE FROM ratelimit WHERE kind = ? AND tat < ?", (self.kind, now))
+        self._syncs += 1
+
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+
+        # excluded.tat - now = число новых событий * interval
+        await self.db.execute(
+            """
+            INSERT INTO ratelimit (kind, key, tat)
+            SELECT ?1, CAST(j.key AS INTEGER), ?2 + j.value * ?3 FROM json_each(?4) AS j WHERE true
+            ON CONFLICT(kind, key) DO UPDATE SET tat = MAX(tat, ?2) + (excluded.tat - ?2)
+            """,
+            (self.kind, now, self.interval, json.dumps(pending)),
+        )
+        rows = await self.db.fetchall(
+            "SELECT key, tat FROM ratelimit WHERE kind = ?1 AND key IN (SELECT value FROM json_each(?2))",
+            (self.kind, json.dumps(list(pending))),
+        )
+        for key, shared_tat in rows:
+            if shared_tat > self._tat.get(key, now):
+                self._tat[key] = shared_tat
+                self._tat.move_to_end(key)
+
+
+def rate_limit_backend(db) -> BackendFactory | None:
+    """Бэкенд из Config.RATE_LIMIT_BACKEND; None — состояние в памяти процесса."""
+    if Config.RATE_LIMIT_BACKEND == "sqlite":
+        sync_interval = Config.RATE_LIMIT_SYNC_MS / 1000
+        return lambda kind, window_sec, max_actions: SQLiteGCRALimiter(
+            db, kind, window_sec, max_actions, sync_interval
+        )
+    return None
 
 
 class RateLimitMiddleware(BaseMiddleware):
@@ -12,58 +164,56 @@ class RateLimitMiddleware(BaseMiddleware):
     - window_sec: длина окна в секундах
     - max_actions: максимум событий в окне
     - kinds: какие типы обрабатывать ("message", "callback")
+    - backend: фабрика хранилища состояния (по умолчанию GCRA в памяти процесса)
     """
-    def __init__(self, window_sec: int = 10, max_actions: int = 5, kinds: Tuple[str, ...] = ("message", "callback")):
+    def __init__(self,
+                 window_sec: int = 10,
+                 max_actions: int = 5,
+                 kinds: Tuple[str, ...] = ("message", "callback"),
+                 backend: BackendFactory | None = None):
         super().__init__()
         self.window_sec = window_sec
         self.max_actions = max_actions
         self.kinds = kinds
 
-        # ключ: (kind, user_id) → дека из timestamps
-        self._hist: Dict[Tuple[str, int], Deque[float]] = defaultdict(deque)
+        # kind → лимитер по user_id
+        if backend is None:
+            backend = lambda kind, w, m: GCRALimiter(w, m)
+        self._limiters: Dict[str, RateLimitBackend] = {
+            kind: backend(kind, window_sec, max_actions) for kind in kinds
+        }
+
+    @property
+    def tracked_keys(self) -> int:
+        return sum(len(limiter) for limiter in self._limiters.values())
+
+    async def close(self) -> None:
+        for limiter in self._limiters.values():
+            await limiter.close()
 
     async def __call__(self,
                        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
                        event: Message | CallbackQuery,
                        data: Dict[str, Any]) -> Any:
-        now = time.monotonic()
+        # настенные часы, а не monotonic: общий бэкенд сравнивает время разных процессов
+        now = time.time()
 
         if isinstance(event, Message) and "message" in self.kinds:
             user_id = event.from_user.id if event.from_user else 0
-            kind = "message"
-            if self._limited(kind, user_id, now):
+            if not self._limiters["message"].hit(user_id, now):
                 try:
                     await event.answer("Слишком часто. Подожди немного ⏳")
                 except Exception:
                     pass
                 return
-            self._push(kind, user_id, now)
 
         elif isinstance(event, CallbackQuery) and "callback" in self.kinds:
             user_id = event.from_user.id if event.from_user else 0
-            kind = "callback"
-            if self._limited(kind, user_id, now):
+            if not self._limiters["callback"].hit(user_id, now):
                 try:
                     await event.answer("Слишком часто. Подожди немного ⏳", show_alert=False)
                 except Exception:
                     pass
                 return
-            self._push(kind, user_id, now)
 
         return await handler(event, data)
-
-    def _push(self, kind: str, uid: int, now: float) -> None:
-        dq = self._hist[(kind, uid)]
-        dq.append(now)
-        self._shrink(dq, now)
-
-    def _limited(self, kind: str, uid: int, now: float) -> bool:
-        dq = self._hist[(kind, uid)]
-        self._shrink(dq, now)
-        return len(dq) >= self.max_actions
-
-    def _shrink(self, dq: Deque[float], now: float) -> None:
-        # удаляем события старше окна
-        limit = now - self.window_sec
-        while dq and dq[0] < limit:
-            dq.popleft()
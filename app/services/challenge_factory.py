@@ -68,13 +68,8 @@ def _compose() -> GeneratedChallenge:
 
 async def ensure_challenge(repo: ChallengeRepo) -> Tuple[int, str, str, str]:
     """
-    Генерирует челлендж, проверяет — есть ли уже такой (title+body) в БД.
-    Если нет — создаёт. Возвращает (id, title, body, tags).
+    Генерирует челлендж и возвращает уже существующий с тем же title+body
+    (поиск по content_hash) или атомарно создаёт новый. Возвращает (id, title, body, tags).
     """
     gen = _compose()
-    existing = await repo.get_by_title_body(gen.title, gen.body)
-    if existing:
-        return existing  # (id, title, body, tags)
-
-    new_id = await repo.create(gen.title, gen.body, gen.tags)
-    return (new_id, gen.title, gen.body, gen.tags)
+    return await repo.get_or_create(gen.title, gen.body, gen.tags)
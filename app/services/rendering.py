@@ -1,4 +1,20 @@
+from app.cache import LRUCache
+from app.config import Config
+from app.keyboards.challenge import keyboard_cache
+
+# (challenge_id, score) → HTML карточки. Текст зависит и от title/body/tags,
+# поэтому при их изменении нужно вызвать invalidate_card(cid).
+card_cache = LRUCache(maxsize=Config.RENDER_CACHE_SIZE)
+
+
 def render_challenge(cid: int, title: str, body: str, tags: str, score: int) -> str:
+    return card_cache.get_or_build(
+        (cid, score),
+        lambda: _render_challenge(cid, title, body, tags, score),
+    )
+
+
+def _render_challenge(cid: int, title: str, body: str, tags: str, score: int) -> str:
     tags_fmt = " ".join(f"#{t.strip()}" for t in (tags or "").split(",") if t.strip())
     return (
         f"💡 <b>Челлендж #{cid}</b>\n"
@@ -7,3 +23,13 @@ def render_challenge(cid: int, title: str, body: str, tags: str, score: int) ->
         f"Теги: {tags_fmt}\n"
         f"Рейтинг: {score:+d}"
     )
+
+
+def invalidate_card(cid: int) -> None:
+    """Сбросить закэшированные карточку и клавиатуру челленджа (после правки его текста)."""
+    card_cache.pop_where(lambda key: key[0] == cid)
+    keyboard_cache.pop_where(lambda key: key[0] == cid)
+
+
+def render_cache_stats() -> dict[str, dict]:
+    return {"cards": card_cache.stats(), "keyboards": keyboard_cache.stats()}
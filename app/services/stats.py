@@ -0,0 +1,37 @@
+from aiogram import Dispatcher
+
+from app.handlers.inline import results_cache
+from app.services.rendering import render_cache_stats
+from app.services.teleutil import edit_coalescer
+from app.storage.repositories.user_repo import UserRepo
+
+
+def runtime_stats(dp: Dispatcher) -> dict[str, dict]:
+    """Состояние кэшей, очередей и правок процесса — для /stats и метрик Prometheus."""
+    caches = render_cache_stats()
+    caches["users"] = UserRepo.cache_for(dp["db"]).stats()
+    caches["inline"] = results_cache.stats()
+    fsm_cache = getattr(dp.storage, "cache", None)
+    if fsm_cache is not None:
+        caches["fsm"] = fsm_cache.stats()
+
+    concurrency = dp["concurrency"]
+    stats = {
+        "caches": caches,
+        "concurrency": {
+            "limit": concurrency.limit,
+            "active": concurrency.active,
+            "waiting": concurrency.waiting,
+        },
+        "coalescer": {
+            "open": len(edit_coalescer),
+            "sent": edit_coalescer.sent,
+            "coalesced": edit_coalescer.coalesced,
+            "skipped": edit_coalescer.skipped,
+        },
+    }
+    # ключей в памяти лимитеров — растёт с числом активных пользователей, а не всех когда-либо писавших
+    stats["ratelimit"] = {"tracked_keys": sum(m.tracked_keys for m in dp["rate_limits"])}
+    if dp["outbound"] is not None:
+        stats["outbound"] = dp["outbound"].stats()
+    return stats
@@ -1,20 +1,101 @@
+import asyncio
+
 from aiogram.exceptions import TelegramBadRequest
+from loguru import logger
 
-async def safe_edit_card(bot, cb, text, reply_markup):
+from app.config import Config
+
+
+async def _edit(bot, target: dict, text, reply_markup):
     try:
-        if cb.inline_message_id:
-            await bot.edit_message_text(
-                text=text,
-                inline_message_id=cb.inline_message_id,
-                reply_markup=reply_markup,
-                parse_mode="HTML",
-            )
-        else:
-            await cb.message.edit_text(
-                text=text,
-                reply_markup=reply_markup,
-                parse_mode="HTML",
-            )
+        await bot.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="HTML", **target)
     except TelegramBadRequest as e:
         if "message is not modified" not in str(e).lower():
             raise
+
+
+class _Slot:
+    __slots__ = ("sent", "pending", "task")
+
+    def __init__(self, sent):
+        self.sent = sent  # (text, markup), которые Telegram уже принял; None — пока ни одна правка не прошла
+        self.pending = None  # последняя отложенная правка окна
+        self.task: asyncio.Task | None = None
+
+
+class EditCoalescer:
+    """
+    Склеивает правки одного сообщения (карточку в inline-режиме правят на каждый голос).
+    Первая правка уходит сразу и открывает окно window_sec; всё, что пришло в окне,
+    схлопывается в одну «хвостовую» правку с последним текстом в конце окна.
+    Правка, которая ничего не меняет, не отправляется вовсе.
+    """
+    def __init__(self, window_sec: float):
+        self.window = window_sec
+        self._slots: dict[tuple, _Slot] = {}
+
+        self.sent = 0
+        self.coalesced = 0
+        self.skipped = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    async def edit(self, bot, target: dict, text, reply_markup):
+        """target — inline_message_id=... или chat_id=..., message_id=... для edit_message_text."""
+        content = (text, reply_markup)
+        if self.window <= 0:
+            self.sent += 1
+            await _edit(bot, target, text, reply_markup)
+            return
+
+        key = tuple(target.values())
+        slot = self._slots.get(key)
+        if slot is not None:
+            if slot.pending is None and content == slot.sent:
+                self.skipped += 1
+            else:
+                if slot.pending is not None:
+                    self.coalesced += 1
+                slot.pending = content
+            return
+
+        # окно открываем до отправки, чтобы правки, пришедшие во время запроса, уже копились
+        self._slots[key] = slot = _Slot(None)
+        slot.task = asyncio.create_task(self._trail(bot, target, key, slot))
+        self.sent += 1
+        await _edit(bot, target, text, reply_markup)
+        # отправленным считаем только принятое: после ошибки та же правка не будет принята за no-op
+        slot.sent = content
+
+    async def _trail(self, bot, target: dict, key: tuple, slot: _Slot):
+        try:
+            while True:
+                await asyncio.sleep(self.window)
+                pending, slot.pending = slot.pending, None
+                if pending is None:
+                    return
+                if pending == slot.sent:
+                    # например, голос поставили и сняли в одном окне
+                    self.skipped += 1
+                    return
+                self.sent += 1
+                try:
+                    await _edit(bot, target, *pending)
+                    slot.sent = pending
+                except Exception:
+                    logger.exception(f"Не удалось применить отложенную правку {key}")
+        finally:
+            self._slots.pop(key, None)
+
+
+edit_coalescer = EditCoalescer(Config.EDIT_COALESCE_MS / 1000)
+
+
+async def safe_edit_card(bot, cb, text, reply_markup):
+    # склеиваем только карточки inline-режима: их правят голоса многих пользователей.
+    # Сообщение в личном чате правит один человек — 🎲 или «Новый» должны примениться сразу
+    if cb.inline_message_id:
+        await edit_coalescer.edit(bot, {"inline_message_id": cb.inline_message_id}, text, reply_markup)
+        return
+    await _edit(bot, {"chat_id": cb.message.chat.id, "message_id": cb.message.message_id}, text, reply_markup)
@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+from loguru import logger
+
+from app.keyboards.challenge import challenge_keyboard
+from app.services.rendering import render_challenge
+from app.storage.repositories.challenge_repo import ChallengeRepo
+
+TOP_PAGE_SIZE = 10  # как PAGE_SIZE в handlers/challenge
+RECENT_ROWS = 5000
+
+
+async def warm_caches(db, cards: int, prefetch: bool = True):
+    """
+    Прогрев после старта, в фоне: карточки и клавиатуры топа — в кэши рендера процесса.
+    prefetch — ещё первая страница /top и последние RECENT_ROWS челленджей в кэш страниц
+    SQLite и ОС; кэш ОС общий, поэтому при нескольких воркерах это делает один.
+    Всё ограничено сверху и не проходит таблицу целиком.
+    """
+    started = time.perf_counter()
+    crepo = ChallengeRepo(db)
+    recent = 0
+    try:
+        top = await crepo.top_cards(limit=cards)
+        for i, (cid, title, body, tags, score) in enumerate(top):
+            render_challenge(cid, title, body, tags, score)
+            challenge_keyboard(cid, score)
+            if i % 100 == 99:
+                await asyncio.sleep(0)
+
+        if prefetch:
+            await crepo.top_page_with_total(TOP_PAGE_SIZE, 1)
+            recent = await crepo.prefetch_recent(RECENT_ROWS)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        logger.exception("Прогрев кэшей не удался")
+        return
+
+    logger.info(
+        f"Кэши прогреты за {time.perf_counter() - started:.2f} с: "
+        f"{len(top)} карточек топа, последних челленджей прочитано: {recent}"
+    )
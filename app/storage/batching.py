@@ -0,0 +1,90 @@
+import asyncio
+from dataclasses import dataclass
+
+from loguru import logger
+
+
+@dataclass(slots=True)
+class WriteResult:
+    # то же, что берут из курсора репозитории: lastrowid/rowcount (+ строка RETURNING)
+    lastrowid: int | None
+    rowcount: int
+    row: tuple | None = None
+
+
+class WriteBatcher:
+    """
+    Групповой коммит: записи, пришедшие за interval_ms (но не больше max_size),
+    выполняются одной транзакцией с одним fsync. submit() возвращает управление
+    только после COMMIT, так что вызывающий по-прежнему ждёт сохранения своей записи.
+    submit_block() — то же для блока Database.run(write=True): он идёт в пачку целиком.
+    """
+    def __init__(self, db, max_size: int = 64, interval_ms: float = 5):
+        self.db = db
+        self.max_size = max(1, max_size)
+        self.interval = max(0.0, interval_ms) / 1000
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+        self.batches = 0
+        self.statements = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # None — сигнал остановки: всё, что уже в очереди, будет записано
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, query: str, params: tuple = (), fetch: bool = False) -> WriteResult:
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((query, params, fetch, fut))
+        return await fut
+
+    async def submit_block(self, fn, args: tuple):
+        # в пачке блок отличается от оператора тем, что вместо текста запроса — функция
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((fn, args, False, fut))
+        return await fut
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            if self.interval and self._queue.qsize() < self.max_size - 1:
+                await asyncio.sleep(self.interval)
+            while len(batch) < self.max_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        try:
+            results = await self.db._write_batch([(q, p, f) for q, p, f, _ in batch])
+        except Exception as e:
+            logger.exception("Ошибка группового коммита")
+            results = [e] * len(batch)
+
+        self.batches += 1
+        self.statements += len(batch)
+
+        for (_, _, _, fut), res in zip(batch, results):
+            if fut.done():
+                continue
+            if isinstance(res, Exception):
+                fut.set_exception(res)
+            else:
+                fut.set_result(res)
@@ -1,22 +1,222 @@
+import asyncio
+import hashlib
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from pathlib import Path
+
 import aiosqlite
 from app.config import Config
+from app.metrics import metrics, timed_query, timed_run
+from app.storage.batching import WriteBatcher, WriteResult
+from app.storage.slowlog import SlowQueryLog
 from loguru import logger
 
 
+# Пересчёт денормализованного рейтинга challenges.score/upvotes/downvotes
+# по таблице votes. Используется для бэкфилла и ручной починки.
+RECOUNT_SCORES_SQL = """
+    UPDATE challenges
+    SET score = COALESCE(agg.score, 0),
+        upvotes = COALESCE(agg.upvotes, 0),
+        downvotes = COALESCE(agg.downvotes, 0)
+    FROM (
+        SELECT c.id AS challenge_id,
+               SUM(v.value) AS score,
+               SUM(v.value = 1) AS upvotes,
+               SUM(v.value = -1) AS downvotes
+        FROM challenges c
+        LEFT JOIN votes v ON v.challenge_id = c.id
+        GROUP BY c.id
+    ) AS agg
+    WHERE agg.challenge_id = challenges.id
+"""
+
+
+def _in_transaction(conn: sqlite3.Connection, begin: str, fn, args):
+    # выполняется в потоке целиком, вместе с BEGIN/COMMIT
+    conn.execute(begin)
+    try:
+        result = fn(conn, *args)
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    return result
+
+
+def _in_savepoint(conn: sqlite3.Connection, fn, args):
+    # блок внутри пачки группового коммита: при исключении откатывается только он
+    conn.execute("SAVEPOINT block")
+    try:
+        result = fn(conn, *args)
+    except BaseException:
+        conn.execute("ROLLBACK TO block")
+        conn.execute("RELEASE block")
+        raise
+    conn.execute("RELEASE block")
+    return result
+
+
+def content_hash(title: str, body: str) -> int:
+    # 64-битный отпечаток title+body для UNIQUE-индекса challenges.content_hash
+    digest = hashlib.blake2b(f"{title}\n{body}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
 class Database:
-    def __init__(self, path: str):
+    """
+    SQLite в режиме WAL: одно соединение на запись (все изменения идут через него
+    по очереди) и пул read-only соединений, на которых fetchone/fetchall выполняются параллельно.
+    run() выполняет синхронные блоки на тех же соединениях в отдельном пуле потоков.
+    """
+    def __init__(
+        self,
+        path: str,
+        read_pool_size: int | None = None,
+        busy_timeout_ms: int | None = None,
+        write_batching: bool | None = None,
+        slow_query_ms: float | None = None,
+    ):
         self.path = path
-        self._conn = None
+        self.read_pool_size = Config.DB_READ_POOL_SIZE if read_pool_size is None else read_pool_size
+        self.busy_timeout_ms = Config.DB_BUSY_TIMEOUT_MS if busy_timeout_ms is None else busy_timeout_ms
+        self.write_batching = Config.DB_WRITE_BATCHING if write_batching is None else write_batching
+        self._conn = None  # writer
+        self._write_lock = asyncio.Lock()
+        self._readers: list[aiosqlite.Connection] = []
+        self._idle_readers: asyncio.Queue | None = None
+        # соединение aiosqlite → его sqlite3.Connection, на котором run() выполняет блоки
+        self._sync: dict[aiosqlite.Connection, sqlite3.Connection] = {}
+        self._block_executor: ThreadPoolExecutor | None = None
+        self.batcher: WriteBatcher | None = None
+        slow_query_ms = Config.DB_SLOW_QUERY_MS if slow_query_ms is None else slow_query_ms
+        self.slowlog = SlowQueryLog(self, slow_query_ms, Config.DB_SLOW_QUERY_REPORT_SEC) if slow_query_ms > 0 else None
+        if metrics.enabled:
+            # обёртки ставятся на экземпляр: без метрик методы вызываются напрямую
+            for op in ("execute", "execute_fetchone", "fetchone", "fetchall"):
+                setattr(self, op, timed_query(getattr(self, op), op))
+            self.run = timed_run(self.run)
 
-    async def connect(self):
+    async def connect(self, migrate_only: bool = False):
+        # migrate_only — только схема на writer: без пула чтения и группового коммита
         logger.info(f"Подключение к базе данных: {self.path}")
-        self._conn = await aiosqlite.connect(self.path)
-        await self._conn.execute("PRAGMA foreign_keys = ON;")
+        self._conn = await self._open(self.path)
+        if self._file_backed:
+            await self._conn.execute("PRAGMA journal_mode = WAL;")
         await self.migrate()
+        if migrate_only:
+            return
+        await self._open_readers()
+
+        if self.write_batching:
+            self.batcher = WriteBatcher(self, Config.DB_BATCH_MAX_SIZE, Config.DB_BATCH_INTERVAL_MS)
+            self.batcher.start()
+            logger.info(
+                f"Групповой коммит: до {self.batcher.max_size} записей / {Config.DB_BATCH_INTERVAL_MS} мс"
+            )
+
+    @property
+    def _file_backed(self) -> bool:
+        return self.path != ":memory:" and not self.path.startswith("file:")
+
+    async def _open(self, database: str, **kwargs) -> aiosqlite.Connection:
+        # factory= и check_same_thread= aiosqlite передаёт в sqlite3.connect как есть:
+        # так у Database есть само соединение для run(), без внутренностей aiosqlite
+        opened = []
+
+        class _Connection(sqlite3.Connection):
+            def __init__(self, *args, **kw):
+                super().__init__(*args, **kw)
+                opened.append(self)
+
+        conn = await aiosqlite.connect(database, factory=_Connection, check_same_thread=False, **kwargs)
+        self._sync[conn] = opened[0]
+        await conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)};")
+        await conn.execute("PRAGMA foreign_keys = ON;")
+        return conn
+
+    async def _open_readers(self):
+        # у :memory: и URI-баз отдельные соединения не видят общих данных — читаем через writer
+        if self.read_pool_size <= 0 or not self._file_backed:
+            return
+
+        uri = f"{Path(self.path).resolve().as_uri()}?mode=ro"
+        self._idle_readers = asyncio.Queue()
+        for _ in range(self.read_pool_size):
+            conn = await self._open(uri, uri=True)
+            self._readers.append(conn)
+            self._idle_readers.put_nowait(conn)
+        logger.info(f"Пул чтения SQLite: {self.read_pool_size} соединений")
+
+    async def close(self):
+        if self.slowlog is not None:
+            await self.slowlog.close()
+
+        if self.batcher is not None:
+            await self.batcher.stop()
+            self.batcher = None
+
+        if self._block_executor is not None:
+            # shutdown дожидается блоков, брошенных отменёнными вызовами run()
+            await asyncio.to_thread(self._block_executor.shutdown)
+            self._block_executor = None
+        self._sync.clear()
+
+        for conn in self._readers:
+            await conn.close()
+        self._readers.clear()
+        self._idle_readers = None
+
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    @asynccontextmanager
+    async def _reader(self):
+        if self._idle_readers is None:
+            # без пула читаем через writer, но не посреди чужой записи: иначе видна
+            # незакоммиченная пачка группового коммита или транзакция блока
+            async with self._write_lock:
+                yield self._conn
+            return
+
+        conn = await self._idle_readers.get()
+        try:
+            yield conn
+        finally:
+            self._idle_readers.put_nowait(conn)
+
+    async def schema_version(self) -> int:
+        async with self._conn.execute("PRAGMA user_version") as cursor:
+            (version,) = await cursor.fetchone()
+        return version
 
     async def migrate(self):
-        logger.info("Проверка и создание таблиц (миграция)...")
+        """
+        Применяет шаги из MIGRATIONS, которых ещё не было в этой базе: номер последнего
+        применённого хранится в PRAGMA user_version. Шаги идемпотентны (IF NOT EXISTS,
+        проверки колонок), так что шаг, прерванный до записи версии, просто повторится.
+        """
+        version = await self.schema_version()
+        target = len(self.MIGRATIONS)
+        if version >= target:
+            logger.info(f"Схема базы актуальна (версия {version})")
+            return
 
+        for number, step in enumerate(self.MIGRATIONS[version:], start=version + 1):
+            logger.info(f"Миграция {number}/{target}: {step.__doc__.strip()}")
+            await step(self)
+            await self._conn.execute(f"PRAGMA user_version = {number}")
+            await self._conn.commit()
+        logger.success(f"Миграция завершена ✅ (версия {target})")
+
+    async def _migrate_base(self):
+        """исходная схема (таблицы, рейтинг, content_hash, FTS, индекс /my)"""
+        # Для баз, созданных до версионирования (user_version = 0), тоже подходит:
+        # всё через IF NOT EXISTS и проверки колонок.
         await self._conn.executescript(
             """
             CREATE TABLE IF NOT EXISTS users (
@@ -32,6 +232,10 @@ class Database:
                 title TEXT NOT NULL,
                 body TEXT NOT NULL,
                 tags TEXT,
+                score INTEGER NOT NULL DEFAULT 0,
+                upvotes INTEGER NOT NULL DEFAULT 0,
+                downvotes INTEGER NOT NULL DEFAULT 0,
+                content_hash INTEGER,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
 
@@ -54,22 +258,350 @@ class Database:
                 FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
                 FOREIGN KEY(challenge_id) REFERENCES challenges(id) ON DELETE CASCADE
             );
+
+            -- общее состояние rate-limit (GCRA) для нескольких процессов
+            CREATE TABLE IF NOT EXISTS ratelimit (
+                kind TEXT NOT NULL,
+                key INTEGER NOT NULL,
+                tat REAL NOT NULL,
+                PRIMARY KEY(kind, key)
+            ) WITHOUT ROWID;
+
+            -- состояния FSM (диалог заметки и т.п.), переживают рестарт и общие для процессов
+            CREATE TABLE IF NOT EXISTS fsm (
+                key TEXT PRIMARY KEY,
+                state TEXT,
+                data TEXT NOT NULL DEFAULT '{}',
+                updated_at REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_fsm_updated ON fsm(updated_at);
+            """
+        )
+        await self._migrate_scores()
+        await self._migrate_content_hash()
+        await self._migrate_search()
+        # keyset-пагинация /my идёт по (created_at, challenge_id) внутри пользователя
+        await self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_saved_user_created "
+            "ON saved(user_id, created_at DESC, challenge_id DESC)"
+        )
+
+    async def _migrate_covering_indexes(self):
+        """индексы под запросы репозиториев (app.tools.check_plans)"""
+        await self._conn.executescript(
+            """
+            -- голоса челленджа: каскадное удаление и сверка рейтинга (GROUP BY challenge_id)
+            -- читают только индекс
+            CREATE INDEX IF NOT EXISTS idx_votes_challenge ON votes(challenge_id, value);
+
+            -- каскадное удаление челленджа из сохранённого без прохода по saved
+            CREATE INDEX IF NOT EXISTS idx_saved_challenge ON saved(challenge_id);
+
+            -- /notes: только строки с заметкой, уже в порядке выдачи; note берётся из индекса
+            CREATE INDEX IF NOT EXISTS idx_saved_user_notes
+                ON saved(user_id, created_at DESC, challenge_id, note)
+                WHERE note IS NOT NULL AND note <> '';
+
+            -- топ и его keyset-страницы (id, title, score) целиком из индекса
+            CREATE INDEX IF NOT EXISTS idx_challenges_top ON challenges(score DESC, id DESC, title);
+            DROP INDEX IF EXISTS idx_challenges_score;
+            """
+        )
+
+    async def _migrate_counters(self):
+        """счётчик челленджей, поддерживаемый триггерами (COUNT(*) для /top без прохода индекса)"""
+        await self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            INSERT OR REPLACE INTO counters (name, value)
+            SELECT 'challenges', COUNT(*) FROM challenges;
+
+            CREATE TRIGGER IF NOT EXISTS trg_challenges_count_insert AFTER INSERT ON challenges
+            BEGIN
+                UPDATE counters SET value = value + 1 WHERE name = 'challenges';
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_challenges_count_delete AFTER DELETE ON challenges
+            BEGIN
+                UPDATE counters SET value = value - 1 WHERE name = 'challenges';
+            END;
+            """
+        )
+
+    # Шаги по порядку: после шага N в базе user_version = N.
+    # Новые шаги — только в конец; выпущенные не менять.
+    MIGRATIONS = (
+        _migrate_base,
+        _migrate_covering_indexes,
+        _migrate_counters,
+    )
+
+    async def _migrate_scores(self):
+        # Старые базы: добавляем колонки рейтинга и один раз пересчитываем их по votes
+        cursor = await self._conn.execute("PRAGMA table_info(challenges)")
+        columns = {row[1] for row in await cursor.fetchall()}
+        if "score" not in columns:
+            logger.info("Добавляю колонки рейтинга в challenges и пересчитываю голоса...")
+            for column in ("score", "upvotes", "downvotes"):
+                await self._conn.execute(
+                    f"ALTER TABLE challenges ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"
+                )
+            await self._conn.execute(RECOUNT_SCORES_SQL)
+
+        await self.create_vote_triggers()
+        await self._conn.execute("CREATE INDEX IF NOT EXISTS idx_challenges_score ON challenges(score DESC, id DESC)")
+
+    async def create_vote_triggers(self):
+        # Триггеры держат рейтинг в актуальном состоянии при любых изменениях votes,
+        # включая каскадное удаление пользователей.
+        await self._conn.executescript(
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_votes_insert AFTER INSERT ON votes
+            BEGIN
+                UPDATE challenges
+                SET score = score + NEW.value,
+                    upvotes = upvotes + (NEW.value = 1),
+                    downvotes = downvotes + (NEW.value = -1)
+                WHERE id = NEW.challenge_id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_votes_delete AFTER DELETE ON votes
+            BEGIN
+                UPDATE challenges
+                SET score = score - OLD.value,
+                    upvotes = upvotes - (OLD.value = 1),
+                    downvotes = downvotes - (OLD.value = -1)
+                WHERE id = OLD.challenge_id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_votes_update AFTER UPDATE OF value, challenge_id ON votes
+            BEGIN
+                UPDATE challenges
+                SET score = score - OLD.value,
+                    upvotes = upvotes - (OLD.value = 1),
+                    downvotes = downvotes - (OLD.value = -1)
+                WHERE id = OLD.challenge_id;
+                UPDATE challenges
+                SET score = score + NEW.value,
+                    upvotes = upvotes + (NEW.value = 1),
+                    downvotes = downvotes + (NEW.value = -1)
+                WHERE id = NEW.challenge_id;
+            END;
+            """
+        )
+
+    async def _migrate_content_hash(self):
+        cursor = await self._conn.execute("PRAGMA table_info(challenges)")
+        columns = {row[1] for row in await cursor.fetchall()}
+        if "content_hash" not in columns:
+            logger.info("Добавляю content_hash в challenges...")
+            await self._conn.execute("ALTER TABLE challenges ADD COLUMN content_hash INTEGER")
+
+            # Дубликаты, успевшие появиться до индекса, оставляем без хэша:
+            # UNIQUE допускает несколько NULL, а отдаваться будет самый ранний.
+            cursor = await self._conn.execute("SELECT id, title, body FROM challenges ORDER BY id")
+            seen = set()
+            updates = []
+            for cid, title, body in await cursor.fetchall():
+                h = content_hash(title, body)
+                if h in seen:
+                    continue
+                seen.add(h)
+                updates.append((h, cid))
+            await self._conn.executemany("UPDATE challenges SET content_hash = ? WHERE id = ?", updates)
+
+        await self._conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_challenges_content_hash ON challenges(content_hash)"
+        )
+
+    async def _migrate_search(self):
+        # Полнотекстовый индекс FTS5 по title/body/tags; содержимое берётся из challenges,
+        # в индексе только токены. Синхронизация — триггерами.
+        cursor = await self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'challenges_fts'"
+        )
+        exists = await cursor.fetchone() is not None
+
+        await self._conn.executescript(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS challenges_fts USING fts5(
+                title, body, tags,
+                content = 'challenges',
+                content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+
+            CREATE TRIGGER IF NOT EXISTS trg_challenges_fts_insert AFTER INSERT ON challenges
+            BEGIN
+                INSERT INTO challenges_fts (rowid, title, body, tags)
+                VALUES (NEW.id, NEW.title, NEW.body, NEW.tags);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_challenges_fts_delete AFTER DELETE ON challenges
+            BEGIN
+                INSERT INTO challenges_fts (challenges_fts, rowid, title, body, tags)
+                VALUES ('delete', OLD.id, OLD.title, OLD.body, OLD.tags);
+            END;
+
+            -- только по тексту: обновления score из триггеров votes индекс не трогают
+            CREATE TRIGGER IF NOT EXISTS trg_challenges_fts_update AFTER UPDATE OF title, body, tags ON challenges
+            BEGIN
+                INSERT INTO challenges_fts (challenges_fts, rowid, title, body, tags)
+                VALUES ('delete', OLD.id, OLD.title, OLD.body, OLD.tags);
+                INSERT INTO challenges_fts (rowid, title, body, tags)
+                VALUES (NEW.id, NEW.title, NEW.body, NEW.tags);
+            END;
             """
         )
-        await self._conn.commit()
-        logger.success("Миграция завершена ✅")
+        if not exists:
+            logger.info("Строю полнотекстовый индекс challenges_fts...")
+            await self._conn.execute("INSERT INTO challenges_fts (challenges_fts) VALUES ('rebuild')")
+
+    # execute возвращает курсор или WriteResult (при групповом коммите) —
+    # у обоих есть lastrowid и rowcount, больше репозитории ничего не используют.
 
     async def execute(self, query: str, params: tuple = ()):
-        cursor = await self._conn.execute(query, params)
-        await self._conn.commit()
-        return cursor
+        if self.batcher is not None:
+            return await self.batcher.submit(query, params)
+
+        async with self._write_lock:
+            started = time.perf_counter()
+            cursor = await self._conn.execute(query, params)
+            self._observe("execute", query, params, started)
+            await self._conn.commit()
+            return cursor
+
+    async def execute_fetchone(self, query: str, params: tuple = ()):
+        # для INSERT/UPDATE ... RETURNING: строку дочитываем до commit
+        if self.batcher is not None:
+            return (await self.batcher.submit(query, params, fetch=True)).row
+
+        async with self._write_lock:
+            started = time.perf_counter()
+            async with self._conn.execute(query, params) as cursor:
+                row = await cursor.fetchone()
+            self._observe("execute_fetchone", query, params, started)
+            await self._conn.commit()
+            return row
+
+    async def _write_batch(self, batch: list[tuple]) -> list:
+        """
+        Выполняет пачку записей одной транзакцией. Ошибка ограничения откатывает
+        только свой оператор (SQLite ABORT), остальные коммитятся вместе.
+        Блоки run(write=True) — в той же транзакции, каждый под своим SAVEPOINT.
+        Возвращает WriteResult, результат блока или исключение для каждой записи.
+        """
+        results = []
+        async with self._write_lock:
+            try:
+                # явный BEGIN IMMEDIATE: блок может начаться с SELECT, а неявный BEGIN
+                # sqlite3 ставит только перед изменением — транзакция сразу на запись
+                await self._conn.execute("BEGIN IMMEDIATE")
+                for query, params, fetch in batch:
+                    if callable(query):
+                        results.append(await self._batch_block(query, params))
+                        continue
+                    try:
+                        started = time.perf_counter()
+                        async with self._conn.execute(query, params) as cursor:
+                            rows = await cursor.fetchall() if fetch else None
+                            results.append(WriteResult(
+                                lastrowid=cursor.lastrowid,
+                                rowcount=cursor.rowcount,
+                                row=rows[0] if rows else None,
+                            ))
+                        self._observe("batch", query, params, started)
+                    except (aiosqlite.IntegrityError, aiosqlite.ProgrammingError) as e:
+                        results.append(e)
+                await self._conn.commit()
+            except Exception as e:
+                await self._conn.rollback()
+                return [e] * len(batch)
+        return results
+
+    async def _batch_block(self, fn, args):
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wrap_future(
+                self._executor().submit(_in_savepoint, self._sync[self._conn], fn, args)
+            )
+        except Exception as e:
+            result = e
+        if self.slowlog is not None:
+            self.slowlog.observe_block(fn.__qualname__, time.perf_counter() - started)
+        return result
+
+    async def run(self, fn, *args, write: bool = False):
+        """
+        Выполняет синхронную fn(conn, *args) в потоке за один переход, а не await
+        на каждый оператор; conn — sqlite3.Connection. Подготовленные операторы
+        sqlite3 кэширует на соединении по тексту SQL, поэтому в fn — постоянные строки запросов.
+        Это API для нескольких операторов подряд: fn выполняется одной транзакцией.
+        write=False — на соединении из пула чтения, в BEGIN ... COMMIT: все SELECT видят один снимок.
+        write=True — на writer под блокировкой записи, BEGIN IMMEDIATE ... COMMIT (откат при исключении):
+        прочитанное внутри не устареет до COMMIT — ни из-за соседней корутины, ни из-за другого процесса.
+        С групповым коммитом блок записи идёт в пачку батчера (откат — только его SAVEPOINT).
+        """
+        if write and self.batcher is not None:
+            return await self.batcher.submit_block(fn, args)
+
+        conn, release = await self._acquire_sync(write)
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        future = self._executor().submit(
+            _in_transaction, conn, "BEGIN IMMEDIATE" if write else "BEGIN", fn, args
+        )
+        # соединение (или блокировка записи) освобождается, только когда поток закончил:
+        # отмена вызывающего не прерывает уже начатый блок и не отдаёт соединение посреди него
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(release))
+        result = await asyncio.wrap_future(future)
+        if self.slowlog is not None:
+            self.slowlog.observe_block(fn.__qualname__, time.perf_counter() - started)
+        return result
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._block_executor is None:
+            self._block_executor = ThreadPoolExecutor(max(1, self.read_pool_size) + 1, thread_name_prefix="db-run")
+        return self._block_executor
+
+    async def _acquire_sync(self, write: bool):
+        # (sqlite3.Connection, release): как _reader(), но освобождение — вызовом release.
+        # Пока соединение выдано, через aiosqlite им никто не пользуется: writer занят
+        # под _write_lock, читатель вынут из очереди — поток блока работает с ним один
+        if write or self._idle_readers is None:
+            await self._write_lock.acquire()
+            return self._sync[self._conn], self._write_lock.release
+        conn = await self._idle_readers.get()
+        return self._sync[conn], partial(self._idle_readers.put_nowait, conn)
+
+    # Курсоры чтения закрываем сразу: недочитанный SELECT держит снимок WAL
+    # на соединении пула, и следующие запросы на нём увидели бы старые данные.
 
     async def fetchone(self, query: str, params: tuple = ()):
-        cursor = await self._conn.execute(query, params)
-        row = await cursor.fetchone()
-        return row
+        async with self._reader() as conn:
+            started = time.perf_counter()
+            async with conn.execute(query, params) as cursor:
+                row = await cursor.fetchone()
+            self._observe("fetchone", query, params, started)
+            return row
 
     async def fetchall(self, query: str, params: tuple = ()):
-        cursor = await self._conn.execute(query, params)
-        rows = await cursor.fetchall()
-        return rows
+        async with self._reader() as conn:
+            started = time.perf_counter()
+            async with conn.execute(query, params) as cursor:
+                rows = await cursor.fetchall()
+            self._observe("fetchall", query, params, started)
+            return rows
+
+    def _observe(self, op: str, query: str, params, started: float) -> None:
+        if self.slowlog is not None:
+            self.slowlog.observe(op, query, params, time.perf_counter() - started)
+
+    async def _explain(self, query: str, params: tuple = ()):
+        # мимо fetchall: план не должен попасть ни в slow-log, ни в метрики
+        async with self._reader() as conn:
+            async with conn.execute("EXPLAIN QUERY PLAN " + query, params) as cursor:
+                return await cursor.fetchall()
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import time
+from typing import Any, Mapping
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from loguru import logger
+
+from app.cache import LRUCache
+
+_EMPTY = (None, {}, 0.0)
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM-хранилище в таблице fsm: состояние переживает рестарт и видно всем процессам на этой базе.
+
+    Чтение идёт через кэш (aiogram спрашивает состояние на каждом апдейте), запись —
+    сразу в базу и в кэш. В нескольких процессах кэш может отставать от соседей
+    на cache_ttl секунд. Состояния старше state_ttl считаются брошенными: при чтении
+    их не видно, а фоновая чистка удаляет их из таблицы пачками.
+    """
+    CLEANUP_BATCH = 500
+
+    def __init__(self,
+                 db,
+                 state_ttl: float = 86400,
+                 cache_size: int = 10_000,
+                 cache_ttl: float = 2,
+                 cleanup_interval: float = 600):
+        self.db = db
+        self.state_ttl = state_ttl
+        self.cleanup_interval = cleanup_interval
+        # key → (state, data, updated_at); отсутствие строки тоже кэшируется — как _EMPTY
+        self.cache = LRUCache(cache_size, cache_ttl)
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._task: asyncio.Task | None = None
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    # --- чтение ---
+
+    async def _get(self, key: str):
+        record = self.cache.get(key)
+        if record is None:
+            row = await self.db.fetchone("SELECT state, data, updated_at FROM fsm WHERE key = ?", (key,))
+            record = _EMPTY if row is None else (row[0], json.loads(row[1]), row[2])
+            self.cache.set(key, record)
+        if record[2] and record[2] < time.time() - self.state_ttl:
+            return _EMPTY
+        return record
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        state, _, _ = await self._get(self.key_builder.build(key))
+        return state
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, data, _ = await self._get(self.key_builder.build(key))
+        return data.copy()
+
+    # --- запись ---
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = self.key_builder.build(key)
+        value = state.state if isinstance(state, State) else state
+        now = time.time()
+        self._ensure_cleanup()
+
+        if value is None:
+            await self.db.execute("UPDATE fsm SET state = NULL, updated_at = ? WHERE key = ?", (now, k))
+            await self._drop_if_empty(k)
+        else:
+            await self.db.execute(
+                """
+                INSERT INTO fsm (key, state, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+                """,
+                (k, value, now),
+            )
+
+        cached = self.cache.get(k)
+        if cached is not None:
+            self.cache.set(k, (value, cached[1], now))
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        k = self.key_builder.build(key)
+        data = dict(data)
+        now = time.time()
+        self._ensure_cleanup()
+
+        if not data:
+            await self.db.execute("UPDATE fsm SET data = '{}', updated_at = ? WHERE key = ?", (now, k))
+            await self._drop_if_empty(k)
+        else:
+            await self.db.execute(
+                """
+                INSERT INTO fsm (key, data, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+                """,
+                (k, json.dumps(data, ensure_ascii=False), now),
+            )
+
+        cached = self.cache.get(k)
+        if cached is not None:
+            self.cache.set(k, (cached[0], data, now))
+
+    async def _drop_if_empty(self, key: str):
+        # пустые строки не храним; условие в SQL, а не по кэшу — сосед мог успеть что-то записать
+        await self.db.execute("DELETE FROM fsm WHERE key = ? AND state IS NULL AND data = '{}'", (key,))
+
+    # --- чистка брошенных состояний ---
+
+    def _ensure_cleanup(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._cleanup_loop())
+
+    async def _cleanup_loop(self):
+        while True:
+            try:
+                removed = await self.cleanup(time.time())
+                if removed:
+                    logger.info(f"FSM: удалено брошенных состояний: {removed}")
+            except Exception:
+                logger.exception("Не удалось почистить таблицу fsm")
+            await asyncio.sleep(self.cleanup_interval)
+
+    async def cleanup(self, now: float) -> int:
+        removed = 0
+        while True:
+            cursor = await self.db.execute(
+                "DELETE FROM fsm WHERE key IN (SELECT key FROM fsm WHERE updated_at < ? LIMIT ?)",
+                (now - self.state_ttl, self.CLEANUP_BATCH),
+            )
+            removed += cursor.rowcount
+            if cursor.rowcount < self.CLEANUP_BATCH:
+                return removed
+            await asyncio.sleep(0)  # пачками, чтобы не держать writer
@@ -1,24 +1,113 @@
+import random
+import re
+from math import ceil
+
+from app.storage.db import content_hash
+
+# Сколько раз пробуем попасть в существующий id, прежде чем взять ближайший сверху
+RANDOM_RETRIES = 3
+
+MAX_SEARCH_TERMS = 8
+WORD_RE = re.compile(r"\w+")
+
+
+def fts_query(text: str) -> str:
+    """
+    Пользовательский текст → выражение FTS5: каждое слово как префикс, все слова обязательны.
+    Кавычки/операторы FTS из ввода не пропускаем — только \w+.
+    """
+    terms = WORD_RE.findall(text.lower())[:MAX_SEARCH_TERMS]
+    return " ".join(f'"{term}"*' for term in terms)
+
+# число челленджей держат триггеры на challenges (миграция _migrate_counters)
+COUNT_SQL = "SELECT value FROM counters WHERE name = 'challenges'"
+
+# cid, title, score — страница топа по номеру (OFFSET)
+TOP_PAGE_SQL = """
+    SELECT id, title, score
+    FROM challenges
+    ORDER BY score DESC, id DESC
+    LIMIT ? OFFSET ?
+"""
+
+
 class ChallengeRepo:
     def __init__(self, db):
         self.db = db
 
     async def create(self, title: str, body: str, tags: str) -> int:
         cursor = await self.db.execute(
-            "INSERT INTO challenges (title, body, tags) VALUES (?, ?, ?)",
-            (title, body, tags)
+            "INSERT INTO challenges (title, body, tags, content_hash) VALUES (?, ?, ?, ?)",
+            (title, body, tags, content_hash(title, body))
         )
         return cursor.lastrowid
 
-    async def get_random(self):
+    async def get_random(self, weighted: bool = False, samples: int = 3):
+        """
+        Случайный челлендж без ORDER BY RANDOM(): выбираем случайный id в диапазоне
+        rowid и ищем его по первичному ключу — стоимость не зависит от размера таблицы.
+        weighted=True — берём лучший по рейтингу из `samples` случайных
+        (чем выше рейтинг, тем чаще челлендж выпадает).
+        """
+        bounds = await self.db.fetchone(
+            "SELECT (SELECT MIN(id) FROM challenges), (SELECT MAX(id) FROM challenges)"
+        )
+        if not bounds or bounds[0] is None:
+            return None
+        lo, hi = bounds
+
+        if not weighted:
+            row = await self._random_probe(lo, hi)
+            return row[:4]
+
+        rows = [await self._random_probe(lo, hi) for _ in range(max(1, samples))]
+        return max(rows, key=lambda r: r[4])[:4]
+
+    async def _random_probe(self, lo: int, hi: int):
+        # id, title, body, tags, score
+        for _ in range(RANDOM_RETRIES):
+            row = await self.db.fetchone(
+                "SELECT id, title, body, tags, score FROM challenges WHERE id = ?",
+                (random.randint(lo, hi),),
+            )
+            if row:
+                return row
+
+        # много «дыр» в id — берём ближайший существующий сверху
         return await self.db.fetchone(
-            "SELECT id, title, body, tags FROM challenges ORDER BY RANDOM() LIMIT 1"
+            "SELECT id, title, body, tags, score FROM challenges WHERE id >= ? ORDER BY id LIMIT 1",
+            (random.randint(lo, hi),),
         )
 
-    async def get_by_title_body(self, title: str, body: str):
+    async def get_by_hash(self, h: int):
         return await self.db.fetchone(
-            "SELECT id, title, body, tags FROM challenges WHERE title = ? AND body = ? LIMIT 1",
-            (title, body),
+            "SELECT id, title, body, tags FROM challenges WHERE content_hash = ?",
+            (h,),
+        )
+
+    async def get_or_create(self, title: str, body: str, tags: str):
+        """
+        Возвращает (id, title, body, tags) челленджа с таким же title+body, создавая его при отсутствии.
+        Обычно это один поиск по UNIQUE-индексу content_hash; вставка атомарна,
+        так что параллельные запросы не создадут дубликат.
+        """
+        h = content_hash(title, body)
+        row = await self.get_by_hash(h)
+        if row:
+            return row
+
+        # INSERT ... SELECT WHERE NOT EXISTS, а не ON CONFLICT: upsert при конфликте
+        # всё равно расходует значение AUTOINCREMENT и оставляет дыры в id.
+        row = await self.db.execute_fetchone(
+            """
+            INSERT INTO challenges (title, body, tags, content_hash)
+            SELECT ?, ?, ?, ?4
+            WHERE NOT EXISTS (SELECT 1 FROM challenges WHERE content_hash = ?4)
+            RETURNING id, title, body, tags
+            """,
+            (title, body, tags, h),
         )
+        return row or await self.get_by_hash(h)
 
     async def get_by_id(self, challenge_id: int):
         return await self.db.fetchone(
@@ -26,33 +115,144 @@ class ChallengeRepo:
             (challenge_id,),
         )
 
+    async def get_card(self, challenge_id: int):
+        # id, title, body, tags, score — всё для карточки одним запросом
+        return await self.db.fetchone(
+            "SELECT id, title, body, tags, score FROM challenges WHERE id = ?",
+            (challenge_id,),
+        )
+
+    async def top_cards(self, limit: int = 5):
+        # id, title, body, tags, score — полные строки топа, без дозапросов по каждой
+        return await self.db.fetchall(
+            """
+            SELECT id, title, body, tags, score
+            FROM challenges
+            ORDER BY score DESC, id DESC
+            LIMIT ?
+            """,
+            (limit,),
+        )
+
+    async def prefetch_recent(self, limit: int) -> int:
+        """
+        Читает челленджи с текстом из последних limit id, чтобы их страницы оказались в кэше
+        SQLite и ОС. Возвращает, сколько строк прочитано.
+        """
+        # диапазон по rowid, а не ORDER BY id DESC LIMIT: план — поиск по ключу, без прохода
+        row = await self.db.fetchone(
+            """
+            SELECT COUNT(*), SUM(length(body))
+            FROM challenges
+            WHERE id > (SELECT MAX(id) FROM challenges) - ?
+            """,
+            (limit,),
+        )
+        return row[0] if row else 0
+
+    async def search(self, text: str, limit: int = 10, offset: int = 0):
+        # id, title, body, tags, score по релевантности (bm25)
+        query = fts_query(text)
+        if not query:
+            return []
+        return await self.db.fetchall(
+            """
+            SELECT c.id, c.title, c.body, c.tags, c.score
+            FROM challenges_fts
+            JOIN challenges c ON c.id = challenges_fts.rowid
+            WHERE challenges_fts MATCH ?
+            ORDER BY rank
+            LIMIT ? OFFSET ?
+            """,
+            (query, limit, offset),
+        )
+
     async def get_top_by_score(self, limit: int = 10):
         return await self.db.fetchall(
             """
-            SELECT c.id, c.title, COALESCE(SUM(v.value), 0) AS score
-            FROM challenges c
-            LEFT JOIN votes v ON v.challenge_id = c.id
-            GROUP BY c.id
-            ORDER BY score DESC, c.id DESC
+            SELECT id, title, score
+            FROM challenges
+            ORDER BY score DESC, id DESC
             LIMIT ?
             """,
             (limit,),
         )
 
     async def count_all(self) -> int:
-        row = await self.db.fetchone("SELECT COUNT(*) FROM challenges")
+        row = await self.db.fetchone(COUNT_SQL)
         return int(row[0]) if row and row[0] is not None else 0
 
     async def top_by_score_page(self, limit: int, offset: int):
         # cid, title, score
+        return await self.db.fetchall(TOP_PAGE_SQL, (limit, offset))
+
+    async def top_page_with_total(self, limit: int, page: int):
+        """
+        (total, page, rows) за один переход в поток соединения (Database.run):
+        число челленджей, номер страницы топа, прижатый к 1..последней, и её строки cid, title, score.
+        """
+        return await self.db.run(self._top_page_with_total, limit, page)
+
+    @staticmethod
+    def _top_page_with_total(conn, limit: int, page: int):
+        row = conn.execute(COUNT_SQL).fetchone()
+        total = row[0] if row else 0
+        page = min(max(1, page), max(1, ceil(total / limit)))
+        rows = conn.execute(TOP_PAGE_SQL, (limit, (page - 1) * limit)).fetchall() if total else []
+        return total, page, rows
+
+    async def top_by_score_seek(self, limit: int, after: tuple[int, int] | None = None, backward: bool = False):
+        """
+        Keyset-пагинация топа: cid, title, score.
+        after — ключ (score, cid) крайней строки соседней страницы;
+        backward=True — страница перед этим ключом (для кнопки «Назад»).
+        """
+        if after is None:
+            return await self.top_by_score_page(limit, 0)
+
+        score, cid = after
+        # (score, id) < (?, ?) SQLite ограничивает по индексу только score,
+        # поэтому ищем двумя диапазонами: та же оценка с меньшим id и оценки ниже.
+        if backward:
+            rows = await self.db.fetchall(
+                """
+                SELECT * FROM (
+                    SELECT * FROM (
+                        SELECT id, title, score FROM challenges
+                        WHERE score = ? AND id > ?
+                        ORDER BY score ASC, id ASC LIMIT ?
+                    )
+                    UNION ALL
+                    SELECT * FROM (
+                        SELECT id, title, score FROM challenges
+                        WHERE score > ?
+                        ORDER BY score ASC, id ASC LIMIT ?
+                    )
+                )
+                ORDER BY score ASC, id ASC
+                LIMIT ?
+                """,
+                (score, cid, limit, score, limit, limit),
+            )
+            return rows[::-1]
+
         return await self.db.fetchall(
             """
-            SELECT c.id, c.title, COALESCE(SUM(v.value), 0) AS score
-            FROM challenges c
-            LEFT JOIN votes v ON v.challenge_id = c.id
-            GROUP BY c.id
-            ORDER BY score DESC, c.id DESC
-            LIMIT ? OFFSET ?
+            SELECT * FROM (
+                SELECT * FROM (
+                    SELECT id, title, score FROM challenges
+                    WHERE score = ? AND id < ?
+                    ORDER BY score DESC, id DESC LIMIT ?
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT id, title, score FROM challenges
+                    WHERE score < ?
+                    ORDER BY score DESC, id DESC LIMIT ?
+                )
+            )
+            ORDER BY score DESC, id DESC
+            LIMIT ?
             """,
-            (limit, offset),
+            (score, cid, limit, score, limit, limit),
         )
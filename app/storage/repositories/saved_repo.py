@@ -1,3 +1,29 @@
+from math import ceil
+
+COUNT_SQL = "SELECT COUNT(*) FROM saved WHERE user_id = ?"
+
+# cid, title, score — страница по номеру (OFFSET); порядок тот же, что у keyset-страниц:
+# сохранения одной секунды различает challenge_id
+PAGE_SQL = """
+    SELECT c.id, c.title, c.score
+    FROM saved s
+    JOIN challenges c ON c.id = s.challenge_id
+    WHERE s.user_id = ?
+    ORDER BY s.created_at DESC, s.challenge_id DESC
+    LIMIT ? OFFSET ?
+"""
+
+# cid, title, score, saved_ts — первая страница keyset-пагинации
+FIRST_SEEK_PAGE_SQL = """
+    SELECT c.id, c.title, c.score, CAST(strftime('%s', s.created_at) AS INTEGER)
+    FROM saved s
+    JOIN challenges c ON c.id = s.challenge_id
+    WHERE s.user_id = ?
+    ORDER BY s.created_at DESC, s.challenge_id DESC
+    LIMIT ?
+"""
+
+
 class SavedRepo:
     def __init__(self, db):
         self.db = db
@@ -26,13 +52,11 @@ class SavedRepo:
     async def list_for_user(self, user_id: int, limit: int = 10):
         rows = await self.db.fetchall(
             """
-            SELECT c.id, c.title, COALESCE(SUM(v.value), 0) AS score
+            SELECT c.id, c.title, c.score
             FROM saved s
             JOIN challenges c ON c.id = s.challenge_id
-            LEFT JOIN votes v ON v.challenge_id = c.id
             WHERE s.user_id = ?
-            GROUP BY c.id
-            ORDER BY s.created_at DESC
+            ORDER BY s.created_at DESC, s.challenge_id DESC
             LIMIT ?
             """,
             (user_id, limit),
@@ -40,27 +64,66 @@ class SavedRepo:
         return rows
 
     async def count_for_user(self, user_id: int) -> int:
-        row = await self.db.fetchone(
-            "SELECT COUNT(*) FROM saved WHERE user_id = ?",
-            (user_id,),
-        )
+        row = await self.db.fetchone(COUNT_SQL, (user_id,))
         return int(row[0]) if row and row[0] is not None else 0
 
     async def page_for_user(self, user_id: int, limit: int, offset: int):
+        return await self.db.fetchall(PAGE_SQL, (user_id, limit, offset))
+
+    async def page_with_total(self, user_id: int, limit: int, page: int):
+        """
+        (total, page, rows) за один переход в поток соединения (Database.run):
+        сколько всего сохранено, номер страницы, прижатый к 1..последней, и её строки cid, title, score.
+        """
+        return await self.db.run(self._page_with_total, user_id, limit, page)
+
+    @staticmethod
+    def _page_with_total(conn, user_id: int, limit: int, page: int):
+        (total,) = conn.execute(COUNT_SQL, (user_id,)).fetchone()
+        page = min(max(1, page), max(1, ceil(total / limit)))
+        rows = conn.execute(PAGE_SQL, (user_id, limit, (page - 1) * limit)).fetchall() if total else []
+        return total, page, rows
+
+    async def first_page_with_total(self, user_id: int, limit: int):
+        """(total, rows) — всего сохранено и первая страница page_for_user_seek, за один переход."""
+        return await self.db.run(self._first_page_with_total, user_id, limit)
+
+    @staticmethod
+    def _first_page_with_total(conn, user_id: int, limit: int):
+        (total,) = conn.execute(COUNT_SQL, (user_id,)).fetchone()
+        rows = conn.execute(FIRST_SEEK_PAGE_SQL, (user_id, limit)).fetchall() if total else []
+        return total, rows
+
+    async def page_for_user_seek(
+        self,
+        user_id: int,
+        limit: int,
+        after: tuple[int, int] | None = None,
+        backward: bool = False,
+    ):
+        """
+        Keyset-пагинация сохранённого: cid, title, score, saved_ts.
+        after — ключ (saved_ts, cid) крайней строки соседней страницы,
+        saved_ts — unix-время s.created_at.
+        """
+        if after is None:
+            return await self.db.fetchall(FIRST_SEEK_PAGE_SQL, (user_id, limit))
+
+        ts, cid = after
+        op = ">" if backward else "<"
+        order = "ASC" if backward else "DESC"
         rows = await self.db.fetchall(
-            """
-            SELECT c.id, c.title, COALESCE(SUM(v.value), 0) AS score
+            f"""
+            SELECT c.id, c.title, c.score, CAST(strftime('%s', s.created_at) AS INTEGER)
             FROM saved s
             JOIN challenges c ON c.id = s.challenge_id
-            LEFT JOIN votes v ON v.challenge_id = c.id
-            WHERE s.user_id = ?
-            GROUP BY c.id
-            ORDER BY s.created_at DESC
-            LIMIT ? OFFSET ?
+            WHERE s.user_id = ? AND (s.created_at, s.challenge_id) {op} (datetime(?, 'unixepoch'), ?)
+            ORDER BY s.created_at {order}, s.challenge_id {order}
+            LIMIT ?
             """,
-            (user_id, limit, offset),
+            (user_id, ts, cid, limit),
         )
-        return rows
+        return rows[::-1] if backward else rows
 
     # --- Новые методы для заметок ---
 
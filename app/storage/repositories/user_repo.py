@@ -1,17 +1,50 @@
+from weakref import WeakKeyDictionary
+
+from app.cache import LRUCache
+from app.config import Config
+
+
 class UserRepo:
+    # tg_id → users.id, свой кэш на каждую Database: репозиторий создаётся на каждый апдейт,
+    # а разные базы (бенчи, инструменты) не должны делить id
+    _caches: WeakKeyDictionary = WeakKeyDictionary()
+
     def __init__(self, db):
         self.db = db
+        self.cache = self.cache_for(db)
+
+    @classmethod
+    def cache_for(cls, db) -> LRUCache:
+        cache = cls._caches.get(db)
+        if cache is None:
+            cache = cls._caches[db] = LRUCache(maxsize=Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL)
+        return cache
 
     async def get_or_create(self, tg_id, username, first_name):
-        row = await self.db.fetchone(
-            "SELECT id FROM users WHERE tg_id = ?",
-            (tg_id,)
-        )
-        if row:
-            return row[0]
+        uid = self.cache.get(tg_id)
+        if uid is not None:
+            return uid
 
-        cursor = await self.db.execute(
-            "INSERT INTO users (tg_id, username, first_name) VALUES (?, ?, ?)",
-            (tg_id, username, first_name)
+        # промах кэша — обычно пользователь уже есть: читаем с пула, без записи на писателе
+        row = await self.db.fetchone(
+            "SELECT id, username, first_name FROM users WHERE tg_id = ?",
+            (tg_id,),
         )
-        return cursor.lastrowid
+        if row is not None and (row[1], row[2]) == (username, first_name):
+            uid = row[0]
+        else:
+            # новый пользователь или сменились username/first_name;
+            # DO UPDATE, чтобы RETURNING вернул id и для существующего
+            row = await self.db.execute_fetchone(
+                """
+                INSERT INTO users (tg_id, username, first_name) VALUES (?, ?, ?)
+                ON CONFLICT(tg_id) DO UPDATE SET
+                    username = excluded.username,
+                    first_name = excluded.first_name
+                RETURNING id
+                """,
+                (tg_id, username, first_name)
+            )
+            uid = row[0]
+        self.cache.set(tg_id, uid)
+        return uid
@@ -1,3 +1,6 @@
+from app.storage.db import RECOUNT_SCORES_SQL
+
+
 class VoteRepo:
     def __init__(self, db):
         self.db = db
@@ -25,9 +28,86 @@ class VoteRepo:
         )
         return None if row is None else int(row[0])
 
+    async def toggle(self, user_id: int, challenge_id: int, value: int):
+        """
+        Повторный голос с тем же значением снимает его, иначе ставит/меняет.
+        Всё в одной транзакции, так что два быстрых нажатия не перемешаются,
+        и за один переход в поток соединения (Database.run).
+        Возвращает (action, score, title, body, tags), action: "removed" | "added" | "changed";
+        None — челленджа нет.
+        """
+        return await self.db.run(self._toggle, user_id, challenge_id, value, write=True)
+
+    @staticmethod
+    def _toggle(conn, user_id: int, challenge_id: int, value: int):
+        row = conn.execute(
+            """
+            SELECT c.title, c.body, c.tags, v.value
+            FROM challenges c
+            LEFT JOIN votes v ON v.challenge_id = c.id AND v.user_id = ?
+            WHERE c.id = ?
+            """,
+            (user_id, challenge_id),
+        ).fetchone()
+        if row is None:
+            return None
+        title, body, tags, prev = row
+
+        if prev == value:
+            conn.execute(
+                "DELETE FROM votes WHERE user_id = ? AND challenge_id = ?",
+                (user_id, challenge_id),
+            )
+            action = "removed"
+        else:
+            conn.execute(
+                """
+                INSERT INTO votes (user_id, challenge_id, value)
+                VALUES (?, ?, ?)
+                ON CONFLICT(user_id, challenge_id) DO UPDATE SET value=excluded.value
+                """,
+                (user_id, challenge_id, value),
+            )
+            action = "added" if prev is None else "changed"
+
+        # score уже пересчитан триггером на votes
+        (score,) = conn.execute("SELECT score FROM challenges WHERE id = ?", (challenge_id,)).fetchone()
+        return action, int(score), title, body, tags
+
     async def get_score(self, challenge_id: int) -> int:
+        # рейтинг хранится в challenges.score и поддерживается триггерами на votes
         row = await self.db.fetchone(
-            "SELECT COALESCE(SUM(value), 0) FROM votes WHERE challenge_id = ?",
+            "SELECT score FROM challenges WHERE id = ?",
             (challenge_id,),
         )
         return int(row[0] if row and row[0] is not None else 0)
+
+    # --- Проверка согласованности challenges.score с votes ---
+
+    async def find_score_mismatches(self, limit: int = 100):
+        # cid, (score, upvotes, downvotes) в challenges, (score, upvotes, downvotes) по votes
+        return await self.db.fetchall(
+            """
+            SELECT c.id, c.score, c.upvotes, c.downvotes,
+                   COALESCE(a.score, 0), COALESCE(a.upvotes, 0), COALESCE(a.downvotes, 0)
+            FROM challenges c
+            LEFT JOIN (
+                SELECT challenge_id,
+                       SUM(value) AS score,
+                       SUM(value = 1) AS upvotes,
+                       SUM(value = -1) AS downvotes
+                FROM votes
+                GROUP BY challenge_id
+            ) a ON a.challenge_id = c.id
+            WHERE c.score <> COALESCE(a.score, 0)
+               OR c.upvotes <> COALESCE(a.upvotes, 0)
+               OR c.downvotes <> COALESCE(a.downvotes, 0)
+            ORDER BY c.id
+            LIMIT ?
+            """,
+            (limit,),
+        )
+
+    async def recount_scores(self) -> int:
+        cursor = await self.db.execute(RECOUNT_SCORES_SQL)
+        return cursor.rowcount
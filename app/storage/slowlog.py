@@ -0,0 +1,155 @@
+import asyncio
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+from loguru import logger
+
+# строковые и числовые литералы в тексте запроса (параметры и так идут через ?)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|(?<![?\w])\d+(?:\.\d+)?\b")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(query: str) -> str:
+    """Один пробел вместо переносов и отступов, литералы заменены на ?."""
+    return _LITERALS.sub("?", " ".join(query.split()))
+
+
+def params_shape(params) -> str:
+    # типы, а не значения: в параметрах бывают пользовательские тексты
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+
+
+def format_plan(rows) -> list[str]:
+    """Строки EXPLAIN QUERY PLAN (id, parent, notused, detail) → дерево с отступами, как в sqlite3."""
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return lines
+
+
+def has_full_scan(plan: list[str]) -> bool:
+    # "SCAN t" — проход по всей таблице; "SCAN t USING INDEX ..." (обход индекса для ORDER BY ... LIMIT),
+    # виртуальные таблицы FTS, подзапросы и SELECT без FROM не считаем
+    for line in plan:
+        detail = line.strip()
+        if detail.startswith("SCAN ") and " USING " not in detail and "VIRTUAL TABLE" not in detail \
+                and "(" not in detail and detail != "SCAN CONSTANT ROW":
+            return True
+    return False
+
+
+@dataclass(slots=True)
+class _Offender:
+    sql: str
+    params: str
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    plan: list[str] | None = None
+
+
+class SlowQueryLog:
+    """
+    Запросы дольше threshold_ms: первый раз — в лог с нормализованным SQL, формой
+    параметров и EXPLAIN QUERY PLAN (план снимается один раз на оператор), дальше —
+    только при новом максимуме. Раз в report_interval — сводка самых дорогих по суммарному времени.
+    Время меряется от начала выполнения на соединении, без ожидания блокировки или читателя из пула.
+    """
+    TOP = 10
+
+    def __init__(self, db, threshold_ms: float, report_interval: float = 600):
+        self.db = db
+        self.threshold = threshold_ms / 1000
+        self.report_interval = report_interval
+        self._offenders: dict[str, _Offender] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._reporter: asyncio.Task | None = None
+
+    def observe(self, op: str, query: str, params, elapsed: float) -> None:
+        if elapsed < self.threshold:
+            return
+
+        sql = normalize_sql(query)
+        offender = self._offenders.get(sql)
+        first = offender is None
+        if first:
+            offender = self._offenders[sql] = _Offender(sql, params_shape(params))
+        offender.count += 1
+        offender.total += elapsed
+        if elapsed <= offender.max and not first:
+            return
+        offender.max = elapsed
+
+        if self._reporter is None and self.report_interval > 0:
+            self._reporter = asyncio.create_task(self._report_loop())
+        if first:
+            task = asyncio.create_task(self._explain(offender, op, query, params, elapsed))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif offender.plan is not None:
+            # пока план снимается, первая запись в лог ещё не вышла — новый максимум попадёт в сводку
+            logger.warning(f"Медленный запрос, новый максимум {elapsed * 1000:.0f} мс ({op}): {sql}")
+
+    def observe_block(self, name: str, elapsed: float) -> None:
+        """Блок Database.run: текста запросов нет, записывается по имени функции и без плана."""
+        if elapsed < self.threshold:
+            return
+
+        sql = f"Database.run({name})"
+        offender = self._offenders.get(sql)
+        if offender is None:
+            offender = self._offenders[sql] = _Offender(sql, "—", plan=[])
+        offender.count += 1
+        offender.total += elapsed
+        if elapsed <= offender.max:
+            return
+        offender.max = elapsed
+
+        if self._reporter is None and self.report_interval > 0:
+            self._reporter = asyncio.create_task(self._report_loop())
+        logger.warning(f"Медленный блок запросов {elapsed * 1000:.0f} мс: {sql}")
+
+    async def _explain(self, offender: _Offender, op: str, query: str, params, elapsed: float):
+        try:
+            offender.plan = format_plan(await self.db._explain(query, params)) or ["(без обращений к таблицам)"]
+        except Exception as e:
+            offender.plan = [f"план не получен: {e}"]
+        logger.warning(
+            f"Медленный запрос {elapsed * 1000:.0f} мс ({op}): {offender.sql}\n"
+            f"  параметры: {offender.params}\n"
+            f"  план:\n" + "\n".join(f"    {line}" for line in offender.plan)
+        )
+
+    def top(self, limit: int = TOP) -> list[_Offender]:
+        return sorted(self._offenders.values(), key=lambda o: -o.total)[:limit]
+
+    def report(self) -> None:
+        offenders = self.top()
+        if not offenders:
+            return
+        lines = [f"Медленные запросы (>{self.threshold * 1000:.0f} мс), топ по суммарному времени:"]
+        for o in offenders:
+            scan = " [полный проход]" if o.plan and has_full_scan(o.plan) else ""
+            lines.append(
+                f"  {o.total:.2f} с, {o.count}×, ср. {o.total / o.count * 1000:.0f} мс, "
+                f"макс. {o.max * 1000:.0f} мс{scan}: {o.sql}"
+            )
+        logger.warning("\n".join(lines))
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.report()
+
+    async def close(self) -> None:
+        if self._reporter is not None:
+            self._reporter.cancel()
+            self._reporter = None
+        for task in list(self._tasks):
+            task.cancel()
+        self.report()
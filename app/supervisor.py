@@ -0,0 +1,370 @@
+"""
+Режим супервизора: один процесс принимает апдейты (polling или webhook) и раздаёт их
+N процессам-воркерам по user_id. Все апдейты одного пользователя попадают в один воркер,
+поэтому его FSM, rate-limit и кэши остаются локальными и точными; база SQLite общая.
+"""
+import asyncio
+import multiprocessing
+import signal
+import time
+from collections import deque
+
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramAPIError, TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import GetUpdates
+from aiohttp import ClientError, web
+from loguru import logger
+
+from app.bot import create_session
+from app.config import Config
+from app.logger_config import setup_logging
+from app.metrics import metrics, start_metrics_server
+
+# типы апдейтов, в которых есть пользователь (поле from)
+USER_FIELDS = (
+    "message",
+    "edited_message",
+    "callback_query",
+    "inline_query",
+    "chosen_inline_result",
+    "pre_checkout_query",
+    "shipping_query",
+    "my_chat_member",
+    "chat_member",
+    "chat_join_request",
+)
+
+# forkserver: воркер (и его перезапуск) — fork чистого процесса, в котором aiogram и модули бота
+# уже импортированы, а не новый интерпретатор с импортом с нуля, как у spawn.
+# Сам app.main не предзагружаем: в воркере он выполняется заново как __mp_main__
+_ctx = multiprocessing.get_context("forkserver")
+_ctx.set_forkserver_preload([
+    "app.supervisor",
+    "app.handlers.admin",
+    "app.handlers.base",
+    "app.handlers.challenge",
+    "app.handlers.inline",
+    "app.middlewares.concurrency",
+    "app.middlewares.ratelimit",
+    "app.services.warmup",
+])
+
+
+def route_key(raw: dict) -> int:
+    for field in USER_FIELDS:
+        event = raw.get(field)
+        if event is None:
+            continue
+        user = event.get("from") or {}
+        if "id" in user:
+            return user["id"]
+        chat = event.get("chat") or {}
+        return chat.get("id", 0)
+    return 0
+
+
+# --- воркер ---
+
+def _worker_main(index: int, workers: int, queue, taken, done):
+    setup_logging()
+    # Ctrl+C получает вся группа процессов — останавливает воркеры супервизор
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker_loop(index, workers, queue, taken, done))
+
+
+async def _worker_loop(index: int, workers: int, queue, taken, done):
+    from app.main import build_dispatcher, shutdown, start_metrics
+    from app.storage.db import Database
+
+    # общий бюджет Bot API делится между воркерами; чат пользователя целиком в одном воркере
+    Config.OUTBOUND_GLOBAL_RPS /= workers
+
+    db = Database(Config.DB_PATH)
+    await db.connect()
+    bot, dp = build_dispatcher(db, index)
+    # METRICS_PORT — у супервизора, воркеры следом
+    await start_metrics(dp, index + 1)
+    # без start_polling startup никто не пошлёт, а по нему запускается прогрев кэшей
+    await dp.emit_startup(bot=bot, dispatcher=dp, **dp.workflow_data)
+    loop = asyncio.get_running_loop()
+    # следующий апдейт забираем, только когда есть свободный слот — очередь остаётся
+    # в multiprocessing.Queue, и супервизор видит её глубину
+    slots = asyncio.Semaphore(Config.UPDATE_CONCURRENCY)
+    tasks: set[asyncio.Task] = set()
+
+    async def handle(raw: dict):
+        try:
+            await dp.feed_raw_update(bot, raw)
+        except Exception:
+            logger.exception(f"Воркер {index}: ошибка обработки апдейта {raw.get('update_id')}")
+        finally:
+            done.value += 1
+            slots.release()
+
+    logger.info(f"Воркер {index} запущен")
+    try:
+        while True:
+            await slots.acquire()
+            raw = await loop.run_in_executor(None, queue.get)
+            if raw is None:
+                break
+            taken.value += 1
+            task = asyncio.create_task(handle(raw))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await bot.session.close()
+        await shutdown(dp, db)
+        logger.info(f"Воркер {index} остановлен")
+
+
+# --- супервизор ---
+
+class _Worker:
+    def __init__(self, index: int):
+        self.index = index
+        self.queue = _ctx.Queue()
+        # счётчики пишет только воркер, читает супервизор
+        self.taken = _ctx.RawValue("q", 0)
+        self.done = _ctx.RawValue("q", 0)
+        self.sent = 0
+        self.restarts = 0
+        self.process = None
+        # копии отправленных в очередь апдейтов, которые воркер ещё не забрал (с номера trimmed):
+        # если он упадёт, их получит новая очередь
+        self.backlog: deque[dict] = deque()
+        self.trimmed = 0
+
+    @property
+    def queued(self) -> int:
+        return self.sent - self.taken.value
+
+    @property
+    def inflight(self) -> int:
+        return self.taken.value - self.done.value
+
+    def trim(self):
+        taken = self.taken.value
+        while self.trimmed < taken and self.backlog:
+            self.backlog.popleft()
+            self.trimmed += 1
+
+    def renew_queue(self):
+        """Новая очередь с тем, что воркер не успел забрать; старую мог оставить занятой упавший get."""
+        self.trim()
+        old, self.queue = self.queue, _ctx.Queue()
+        # старую больше никто не читает — её фоновый поток не должен держать процесс при выходе
+        old.cancel_join_thread()
+        old.close()
+        for raw in self.backlog:
+            self.queue.put(raw)
+
+
+class Supervisor:
+    def __init__(self, workers: int, report_interval: float = 30):
+        self.workers = [_Worker(i) for i in range(workers)]
+        self.report_interval = report_interval
+        self._stopping = False
+
+    def start(self):
+        for worker in self.workers:
+            self._spawn(worker)
+
+    def _spawn(self, worker: _Worker):
+        worker.process = _ctx.Process(
+            target=_worker_main,
+            args=(worker.index, len(self.workers), worker.queue, worker.taken, worker.done),
+            name=f"worker-{worker.index}",
+        )
+        worker.process.start()
+
+    def route(self, raw: dict):
+        worker = self.workers[route_key(raw) % len(self.workers)]
+        worker.sent += 1
+        worker.backlog.append(raw)
+        worker.trim()
+        worker.queue.put(raw)
+
+    def collect(self):
+        for s in self.stats():
+            labels = (("worker", str(s["worker"])),)
+            for key in ("alive", "queued", "inflight", "processed", "restarts"):
+                yield f"supervisor_{key}", labels, int(s[key])
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "worker": w.index,
+                "alive": w.process.is_alive(),
+                "queued": w.queued,
+                "inflight": w.inflight,
+                "processed": w.done.value,
+                "restarts": w.restarts,
+            }
+            for w in self.workers
+        ]
+
+    async def monitor(self):
+        last_report = time.monotonic()
+        while not self._stopping:
+            await asyncio.sleep(1)
+            for worker in self.workers:
+                if self._stopping or worker.process.is_alive():
+                    continue
+                lost = worker.inflight
+                logger.error(
+                    f"Воркер {worker.index} упал (код {worker.process.exitcode}), "
+                    f"потеряно апдейтов в обработке: {lost}; перезапускаю"
+                )
+                worker.done.value = worker.taken.value
+                worker.restarts += 1
+                # queue.get держит блокировку чтения, пока ждёт: воркер, убитый в ожидании, оставил бы
+                # её занятой навсегда. Апдейт, который он уже достал, но не успел отметить, придёт повторно
+                worker.renew_queue()
+                self._spawn(worker)
+
+            if time.monotonic() - last_report >= self.report_interval:
+                last_report = time.monotonic()
+                logger.info(
+                    "Воркеры: " + ", ".join(
+                        f"#{s['worker']} очередь={s['queued']} в работе={s['inflight']} "
+                        f"обработано={s['processed']} рестартов={s['restarts']}"
+                        for s in self.stats()
+                    )
+                )
+
+    def stop(self, timeout: float = 30):
+        self._stopping = True
+        for worker in self.workers:
+            worker.queue.put(None)
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+
+
+# --- приём апдейтов ---
+
+def _allowed_updates() -> list[str]:
+    from app.handlers.admin import router as admin_router
+    from app.handlers.base import router as base_router
+    from app.handlers.inline import router as inline_router
+    from app.handlers.challenge import router as challenge_router
+
+    dp = Dispatcher()
+    dp.include_routers(admin_router, base_router, challenge_router, inline_router)
+    return dp.resolve_used_update_types()
+
+
+async def _get_updates_raw(bot: Bot, method: GetUpdates) -> list[dict]:
+    """
+    getUpdates с результатом как есть, в JSON: воркер всё равно разбирает апдейт сам
+    (feed_raw_update), модели aiogram здесь — лишний разбор и обратная сериализация.
+    Ошибки — те же исключения aiogram, что и у bot.get_updates.
+    """
+    session = bot.session
+    http = await session.create_session()
+    url = session.api.api_url(token=bot.token, method=method.__api_method__)
+    try:
+        async with http.post(
+            url,
+            data=session.build_form_data(bot=bot, method=method),
+            timeout=session.timeout + (method.timeout or 0),
+        ) as resp:
+            content = await resp.text()
+    except asyncio.TimeoutError as e:
+        raise TelegramNetworkError(method=method, message="Request timeout error") from e
+    except ClientError as e:
+        raise TelegramNetworkError(method=method, message=f"{type(e).__name__}: {e}") from e
+
+    data = session.json_loads(content)
+    if resp.status == 200 and data.get("ok"):
+        return data["result"]
+    session.check_response(bot=bot, method=method, status_code=resp.status, content=content)
+    raise TelegramAPIError(method=method, message=str(data.get("description")))
+
+
+async def _poll(bot: Bot, supervisor: Supervisor, allowed: list[str]):
+    offset = None
+    backoff = 1.0
+    while True:
+        try:
+            updates = await _get_updates_raw(
+                bot, GetUpdates(offset=offset, timeout=25, allowed_updates=allowed)
+            )
+        except TelegramRetryAfter as e:
+            logger.warning(f"getUpdates: flood control, пауза {e.retry_after} с")
+            await asyncio.sleep(e.retry_after)
+            continue
+        except Exception as e:
+            # 5xx, перезапуск Telegram, сеть — приём не должен останавливать воркеры
+            logger.warning(f"getUpdates: {type(e).__name__}: {e}; повтор через {backoff:.0f} с")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+            continue
+        backoff = 1.0
+        for raw in updates:
+            supervisor.route(raw)
+            offset = raw["update_id"] + 1
+
+
+async def _serve_webhook(bot: Bot, supervisor: Supervisor, allowed: list[str]):
+    from app.webhook import ensure_webhook
+
+    async def handle(request: web.Request) -> web.Response:
+        if Config.WEBHOOK_SECRET and \
+                request.headers.get("X-Telegram-Bot-Api-Secret-Token") != Config.WEBHOOK_SECRET:
+            return web.Response(status=401)
+        supervisor.route(await request.json())
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post(Config.WEBHOOK_PATH, handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, Config.WEBHOOK_HOST, Config.WEBHOOK_PORT).start()
+    logger.info(f"Webhook-сервер слушает {Config.WEBHOOK_HOST}:{Config.WEBHOOK_PORT}{Config.WEBHOOK_PATH}")
+    try:
+        if Config.WEBHOOK_URL:
+            await ensure_webhook(bot, allowed)
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def _ingest(supervisor: Supervisor):
+    bot = Bot(token=Config.BOT_TOKEN, session=create_session())
+    allowed = _allowed_updates()
+    monitor = asyncio.create_task(supervisor.monitor())
+    metrics_server = None
+    if metrics.enabled and Config.METRICS_PORT:
+        metrics.add_collector(supervisor.collect)
+        metrics_server = await start_metrics_server(Config.METRICS_HOST, Config.METRICS_PORT)
+    try:
+        if Config.RUN_MODE == "webhook":
+            await _serve_webhook(bot, supervisor, allowed)
+        else:
+            await bot.delete_webhook()
+            await _poll(bot, supervisor, allowed)
+    finally:
+        monitor.cancel()
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+        await bot.session.close()
+
+
+def run_supervisor(workers: int):
+    supervisor = Supervisor(workers)
+    supervisor.start()
+    logger.info(f"Супервизор: {workers} воркеров, приём — {Config.RUN_MODE}")
+    try:
+        asyncio.run(_ingest(supervisor))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("Останавливаю воркеры...")
+        supervisor.stop()
@@ -0,0 +1,170 @@
+"""
+Проверка планов запросов: вызывает каждый метод репозиториев на временной базе,
+перехватывает выполненный SQL (с подставленными параметрами) и проверяет
+EXPLAIN QUERY PLAN — ни один запрос не должен проходить таблицу целиком.
+
+    python -m app.tools.check_plans             # код выхода 1, если есть полный проход
+    python -m app.tools.check_plans --verbose   # планы всех запросов
+"""
+import argparse
+import asyncio
+import inspect
+import os
+import sys
+import tempfile
+
+from app.logger_config import setup_logging
+from app.storage.db import Database
+from app.storage.repositories.challenge_repo import ChallengeRepo
+from app.storage.repositories.saved_repo import SavedRepo
+from app.storage.repositories.user_repo import UserRepo
+from app.storage.repositories.vote_repo import VoteRepo
+from app.storage.slowlog import format_plan, has_full_scan, normalize_sql
+
+# сверка рейтинга по всей таблице — полный проход здесь ожидаем
+FULL_SCAN_ALLOWED = {
+    "VoteRepo.find_score_mismatches",
+    "VoteRepo.recount_scores",
+}
+
+
+async def exercise(db: Database, record) -> set[str]:
+    """Вызывает все методы репозиториев; record(name) отмечает, чей SQL выполняется дальше."""
+    users, challenges, saved, votes = UserRepo(db), ChallengeRepo(db), SavedRepo(db), VoteRepo(db)
+    called = set()
+
+    async def call(repo, method: str, *args):
+        name = f"{type(repo).__name__}.{method}"
+        record(name)
+        called.add(name)
+        return await getattr(repo, method)(*args)
+
+    uids = [await call(users, "get_or_create", 100 + i, f"u{i}", "U") for i in range(3)]
+    users.cache.clear()
+    await call(users, "get_or_create", 100, "u0", "U")
+    users.cache.clear()
+    await call(users, "get_or_create", 100, "u0-renamed", "U")
+
+    cids = [await call(challenges, "create", f"Задача {i}", f"Описание {i}", "#tag") for i in range(20)]
+    row = await call(challenges, "get_or_create", "Задача 0", "Описание 0", "#tag")
+    await call(challenges, "get_or_create", "Новая", "Новое описание", "#tag")
+    await call(challenges, "get_by_hash", 0)
+    await call(challenges, "get_random")
+    await call(challenges, "get_random", True)
+    await call(challenges, "_random_probe", cids[0], cids[-1])
+    await call(challenges, "get_by_id", row[0])
+    await call(challenges, "get_card", row[0])
+    await call(challenges, "top_cards")
+    await call(challenges, "search", "задача описание")
+    await call(challenges, "get_top_by_score")
+    await call(challenges, "count_all")
+    await call(challenges, "prefetch_recent", 10)
+    await call(challenges, "top_by_score_page", 10, 10)
+    await call(challenges, "top_page_with_total", 10, 2)
+    page = await call(challenges, "top_by_score_seek", 10)
+    key = (page[-1][2], page[-1][0])
+    await call(challenges, "top_by_score_seek", 10, key)
+    await call(challenges, "top_by_score_seek", 10, key, True)
+
+    for cid in cids[:12]:
+        await call(saved, "save", uids[0], cid)
+    await call(saved, "save_with_note", uids[0], cids[0], "заметка")
+    await call(saved, "list_for_user", uids[0])
+    await call(saved, "count_for_user", uids[0])
+    await call(saved, "page_for_user", uids[0], 10, 0)
+    await call(saved, "page_with_total", uids[0], 10, 2)
+    await call(saved, "first_page_with_total", uids[0], 5)
+    rows = await call(saved, "page_for_user_seek", uids[0], 5)
+    key = (rows[-1][3], rows[-1][0])
+    await call(saved, "page_for_user_seek", uids[0], 5, key)
+    await call(saved, "page_for_user_seek", uids[0], 5, key, True)
+    await call(saved, "list_notes_for_user", uids[0])
+    await call(saved, "get_note", uids[0], cids[0])
+
+    await call(votes, "upsert_vote", uids[1], cids[0], 1)
+    await call(votes, "get_user_vote", uids[1], cids[0])
+    await call(votes, "toggle", uids[1], cids[1], 1)
+    await call(votes, "toggle", uids[1], cids[1], 1)
+    await call(votes, "delete_vote", uids[1], cids[0])
+    await call(votes, "get_score", cids[0])
+    await call(votes, "find_score_mismatches")
+    await call(votes, "recount_scores")
+    return called
+
+
+def public_methods() -> set[str]:
+    names = set()
+    for repo in (UserRepo, ChallengeRepo, SavedRepo, VoteRepo):
+        for name, fn in inspect.getmembers(repo, inspect.iscoroutinefunction):
+            if not name.startswith("__"):
+                names.add(f"{repo.__name__}.{name}")
+    return names
+
+
+def _indent(plan: list[str]) -> str:
+    return "\n".join(f"    {line}" for line in plan)
+
+
+async def check_plans(verbose: bool) -> int:
+    logger = setup_logging()
+
+    tmp = tempfile.TemporaryDirectory()
+    db = Database(os.path.join(tmp.name, "plans.db"))
+    await db.connect()
+    try:
+        # (метод, нормализованный SQL) → SQL с параметрами, как его выполнила SQLite
+        statements: dict[tuple[str, str], str] = {}
+        current = ["?"]
+
+        def trace(sql: str):
+            # строки "-- TRIGGER ..." — тела триггеров, их планы видны в плане самого оператора;
+            # *_fts_config/_data/_idx — служебные запросы FTS5 к своим таблицам
+            if sql.startswith("--") or "_fts_" in sql \
+                    or sql.split(None, 1)[0].upper() in ("BEGIN", "COMMIT", "ROLLBACK", "PRAGMA"):
+                return
+            statements.setdefault((current[0], normalize_sql(sql)), sql)
+
+        connections = [db._conn, *db._readers]
+        for conn in connections:
+            await conn.set_trace_callback(trace)
+        called = await exercise(db, lambda name: current.__setitem__(0, name))
+        for conn in connections:
+            await conn.set_trace_callback(None)
+
+        missed = public_methods() - called
+        for name in sorted(missed):
+            logger.warning(f"{name} не вызывается в check_plans — добавьте его в exercise()")
+
+        failures = 0
+        for (method, normalized), sql in statements.items():
+            async with db._conn.execute("EXPLAIN QUERY PLAN " + sql) as cursor:
+                plan = format_plan(await cursor.fetchall())
+            full_scan = has_full_scan(plan)
+            if full_scan and method not in FULL_SCAN_ALLOWED:
+                failures += 1
+                logger.error(f"{method}: полный проход таблицы\n  {normalized}\n" + _indent(plan))
+            elif verbose:
+                logger.info(f"{method}: {normalized}\n" + _indent(plan))
+
+        if failures or missed:
+            logger.warning(
+                f"Запросов: {len(statements)}, с полным проходом: {failures}, "
+                f"непроверенных методов: {len(missed)}"
+            )
+            return 1
+        logger.success(f"Все {len(statements)} запросов репозиториев идут по индексам ✅")
+        return 0
+    finally:
+        await db.close()
+        tmp.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка планов запросов репозиториев")
+    parser.add_argument("--verbose", action="store_true", help="показать планы всех запросов")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(check_plans(args.verbose)))
+
+
+if __name__ == "__main__":
+    main()
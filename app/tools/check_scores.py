@@ -0,0 +1,54 @@
+"""
+Проверка согласованности рейтинга: challenges.score/upvotes/downvotes против votes.
+
+    python -m app.tools.check_scores          # только отчёт
+    python -m app.tools.check_scores --fix    # пересчитать рейтинг по votes
+"""
+import argparse
+import asyncio
+import sys
+
+from app.logger_config import setup_logging
+from app.config import Config
+from app.storage.db import Database
+from app.storage.repositories.vote_repo import VoteRepo
+
+
+async def check_scores(fix: bool, limit: int) -> int:
+    logger = setup_logging()
+
+    db = Database(Config.DB_PATH)
+    await db.connect()
+    try:
+        vrepo = VoteRepo(db)
+        mismatches = await vrepo.find_score_mismatches(limit=limit)
+        if not mismatches:
+            logger.success("Рейтинг согласован с votes ✅")
+            return 0
+
+        for cid, score, up, down, real_score, real_up, real_down in mismatches:
+            logger.warning(
+                f"#{cid}: score={score} (+{up}/-{down}), по votes: {real_score} (+{real_up}/-{real_down})"
+            )
+        logger.warning(f"Найдено расхождений: {len(mismatches)} (показано не более {limit})")
+
+        if not fix:
+            return 1
+
+        updated = await vrepo.recount_scores()
+        logger.success(f"Рейтинг пересчитан, обновлено строк: {updated}")
+        return 0
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка challenges.score против votes")
+    parser.add_argument("--fix", action="store_true", help="пересчитать рейтинг по votes")
+    parser.add_argument("--limit", type=int, default=100, help="сколько расхождений показать")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(check_scores(args.fix, args.limit)))
+
+
+if __name__ == "__main__":
+    main()
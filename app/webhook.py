@@ -0,0 +1,57 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from loguru import logger
+
+from app.config import Config
+
+
+async def ensure_webhook(bot: Bot, allowed_updates: list[str]):
+    url = Config.WEBHOOK_URL.rstrip("/") + Config.WEBHOOK_PATH
+    info = await bot.get_webhook_info()
+    # getWebhookInfo не возвращает секрет: с WEBHOOK_SECRET регистрируем всегда,
+    # иначе после смены секрета Telegram слал бы старый, а мы отвечали бы 401
+    if (
+        not Config.WEBHOOK_SECRET
+        and info.url == url
+        and sorted(info.allowed_updates or []) == sorted(allowed_updates)
+        and info.max_connections == Config.WEBHOOK_MAX_CONNECTIONS
+    ):
+        return
+    await bot.set_webhook(
+        url,
+        secret_token=Config.WEBHOOK_SECRET or None,
+        allowed_updates=allowed_updates,
+        max_connections=Config.WEBHOOK_MAX_CONNECTIONS,
+    )
+    logger.info(f"Webhook установлен: {url}")
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, set_webhook: bool = True, reuse_port: bool = False):
+    """
+    Принимает апдейты HTTP-сервером aiohttp: Telegram получает 200 сразу,
+    обработка идёт в фоне (её параллельность ограничивает ConcurrencyLimitMiddleware).
+    reuse_port — несколько процессов слушают один порт, ядро раскидывает соединения между ними.
+    """
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=Config.WEBHOOK_SECRET or None,
+    ).register(app, path=Config.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, Config.WEBHOOK_HOST, Config.WEBHOOK_PORT, reuse_port=reuse_port or None)
+    await site.start()
+    logger.info(f"Webhook-сервер слушает {Config.WEBHOOK_HOST}:{Config.WEBHOOK_PORT}{Config.WEBHOOK_PATH}")
+
+    try:
+        if set_webhook and Config.WEBHOOK_URL:
+            await ensure_webhook(bot, dp.resolve_used_update_types())
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,193 @@
+"""
+Микробенчмарк декодера callback_data: прежний (regex-цепочка + двойная проверка подписи)
+против табличного keyboards.callbacks.decode на реалистичной смеси нажатий.
+
+    python -m bench.callbacks_decode --n 200000
+"""
+import argparse
+import hashlib
+import hmac
+import random
+import re
+import timeit
+
+from app.logger_config import setup_logging
+from app.config import Config
+from app.keyboards.callbacks import (
+    MAX_ID,
+    MAX_PAGE,
+    VotePayload,
+    SavePayload,
+    SaveNoteDecisionPayload,
+    PagePayload,
+    PageSeekPayload,
+    NotePayload,
+    decode,
+    encode_vote,
+    encode_save,
+    encode_new,
+    encode_page,
+    encode_page_seek,
+    encode_noop,
+    encode_save_decision,
+    encode_note,
+    encode_note_list,
+)
+
+# --- прежняя реализация decode, для сравнения ---
+
+VOTE_RE = re.compile(r"^cf:1:v:(-?\d+):(-?1)$")
+SAVE_RE = re.compile(r"^cf:1:s:(-?\d+)$")
+NEW_RE = re.compile(r"^cf:1:n$")
+PAGE_RE = re.compile(r"^cf:1:p:([a-z]+):(\d+)$")
+PK_RE = re.compile(r"^cf:1:pk:([a-z]+):([fb]):(\d+):(\d+):(-?\d+):(-?\d+)$")
+SN_RE = re.compile(r"^cf:1:sn:(-?\d+):(y|n)$")
+NT_RE = re.compile(r"^cf:1:nt:(-?\d+)$")
+NL_RE = re.compile(r"^cf:1:nl$")
+
+
+def _legacy_sign(raw: str) -> str:
+    mac = hmac.new(Config.CALLBACK_SECRET.encode("utf-8"), raw.encode("utf-8"), hashlib.sha1).hexdigest()
+    return mac[:6]
+
+
+def _legacy_verify(full: str) -> bool:
+    try:
+        head, sig = full.rsplit(":", 1)
+    except ValueError:
+        return False
+    return hmac.compare_digest(_legacy_sign(head), sig)
+
+
+def legacy_decode(data: str):
+    if data == "cf:noop":
+        return {"type": "noop"}
+    if Config.CALLBACK_SECRET:
+        try:
+            head, sig = data.rsplit(":", 1)
+        except ValueError:
+            return None
+        if not _legacy_verify(data):
+            return None
+        payload = head
+    else:
+        payload = data
+
+    m = VOTE_RE.match(payload)
+    if m:
+        cid, val = int(m.group(1)), int(m.group(2))
+        if not (-MAX_ID <= cid <= MAX_ID):
+            return None
+        return {"type": "vote", "data": VotePayload(cid=cid, val=val)}
+    m = SAVE_RE.match(payload)
+    if m:
+        cid = int(m.group(1))
+        if not (-MAX_ID <= cid <= MAX_ID):
+            return None
+        return {"type": "save", "data": SavePayload(cid=cid)}
+    m = SN_RE.match(payload)
+    if m:
+        cid = int(m.group(1))
+        if not (-MAX_ID <= cid <= MAX_ID):
+            return None
+        return {"type": "save_decision", "data": SaveNoteDecisionPayload(cid=cid, decision=m.group(2))}
+    if NEW_RE.match(payload):
+        return {"type": "new"}
+    m = PAGE_RE.match(payload)
+    if m:
+        page = int(m.group(2))
+        if page < 1 or page > MAX_PAGE or m.group(1) not in ("my", "top"):
+            return None
+        return {"type": "page", "data": PagePayload(list_id=m.group(1), page=page)}
+    m = PK_RE.match(payload)
+    if m:
+        page, total_pages, k1, k2 = (int(m.group(i)) for i in (3, 4, 5, 6))
+        if not (1 <= page <= total_pages <= MAX_PAGE) or m.group(1) not in ("my", "top"):
+            return None
+        if not (-MAX_ID <= k1 <= MAX_ID and -MAX_ID <= k2 <= MAX_ID):
+            return None
+        return {"type": "page_seek", "data": PageSeekPayload(m.group(1), m.group(2), page, total_pages, (k1, k2))}
+    m = NT_RE.match(payload)
+    if m:
+        cid = int(m.group(1))
+        if not (-MAX_ID <= cid <= MAX_ID):
+            return None
+        return {"type": "note", "data": NotePayload(cid=cid)}
+    if NL_RE.match(payload):
+        return {"type": "note_list"}
+    return None
+
+
+def callback_mix(n: int, rnd: random.Random) -> list[str]:
+    # примерно как в проде: в основном голоса, затем листание и 🎲
+    makers = [
+        (55, lambda: encode_vote(rnd.randint(1, 50_000), rnd.choice((1, -1)))),
+        (10, lambda: encode_page_seek(rnd.choice(("my", "top")), rnd.choice("fb"), 2, 40, (rnd.randint(-5, 90), rnd.randint(1, 50_000)))),
+        (10, encode_new),
+        (5, lambda: encode_page("top", rnd.randint(1, 40))),
+        (5, lambda: encode_save(rnd.randint(1, 50_000))),
+        (5, lambda: encode_save_decision(rnd.randint(1, 50_000), rnd.choice("yn"))),
+        (3, encode_note_list),
+        (2, lambda: encode_note(rnd.randint(1, 50_000))),
+        (3, encode_noop),
+        (2, lambda: "cf:1:v:12:1:000000"),  # подделка / битые данные
+    ]
+    weights = [w for w, _ in makers]
+    return [rnd.choices(makers, weights)[0][1]() for _ in range(n)]
+
+
+def fuzz_equivalence(rnd: random.Random, samples: list[str], n: int = 20_000) -> int:
+    alphabet = "cf:1vnspktbly0123456789-+_ "
+    mutated = []
+    for _ in range(n):
+        s = list(rnd.choice(samples))
+        for _ in range(rnd.randint(1, 3)):
+            i = rnd.randrange(len(s) + 1)
+            op = rnd.random()
+            if op < 0.4 and s:
+                del s[min(i, len(s) - 1)]
+            elif op < 0.8:
+                s.insert(i, rnd.choice(alphabet))
+            elif s:
+                s[min(i, len(s) - 1)] = rnd.choice(alphabet)
+        mutated.append("".join(s))
+
+    mismatches = 0
+    for data in samples + mutated:
+        if legacy_decode(data) != decode(data):
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    logger = setup_logging()
+    parser = argparse.ArgumentParser(description="Сравнение декодеров callback_data")
+    parser.add_argument("--n", type=int, default=100_000, help="сколько декодирований на замер")
+    parser.add_argument("--secret", default=Config.CALLBACK_SECRET or "bench-secret")
+    args = parser.parse_args()
+
+    Config.CALLBACK_SECRET = args.secret
+    rnd = random.Random(7)
+    samples = callback_mix(5_000, rnd)
+
+    for secret in (args.secret, ""):
+        Config.CALLBACK_SECRET = secret
+        mismatches = fuzz_equivalence(random.Random(1), samples if secret else callback_mix(5_000, rnd))
+        if mismatches:
+            logger.error(f"Декодеры расходятся на {mismatches} строках (secret={bool(secret)})")
+        else:
+            logger.info(f"Результаты совпадают с прежним декодером (secret={bool(secret)})")
+    Config.CALLBACK_SECRET = args.secret
+
+    stream = (samples * (args.n // len(samples) + 1))[: args.n]
+    timings = {}
+    for name, fn in (("legacy", legacy_decode), ("table", decode)):
+        best = min(timeit.repeat(lambda: [fn(d) for d in stream], number=1, repeat=5))
+        timings[name] = best
+        logger.info(f"{name:>6}: {best / args.n * 1e9:,.0f} нс/декод")
+
+    logger.success(f"Ускорение: x{timings['legacy'] / timings['table']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
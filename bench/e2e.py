@@ -0,0 +1,378 @@
+"""
+Сквозной бенчмарк: настоящий Dispatcher со всеми обработчиками и middleware,
+засеянная база (пользователи, челленджи, голоса, сохранённые) и синтетические апдейты.
+Bot API заменён заглушкой-сессией: ответы разбираются тем же кодом aiogram, но без сети.
+
+    python -m bench.e2e --votes 1000000 --updates 2000
+    python -m bench.e2e --db /tmp/e2e.db --reuse --compare bench_results/e2e-old.json
+
+Для каждого вида апдейта — отдельный прогон: апдейтов/с и задержка обработки p50/p95/p99.
+Результат пишется в JSON, чтобы сравнивать прогоны между собой (--compare).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from math import ceil
+
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Message
+from loguru import logger
+
+from app.config import Config
+from app.keyboards.callbacks import (
+    encode_vote,
+    encode_new,
+    encode_page_seek,
+    encode_save_decision,
+    encode_note_list,
+)
+from app.logger_config import setup_logging
+from app.storage.db import Database, RECOUNT_SCORES_SQL
+from app.storage.repositories.challenge_repo import ChallengeRepo
+
+TG_ID_BASE = 1_000_000_000
+PAGE_SIZE = 10
+KINDS = (
+    "vote",
+    "new",
+    "page",
+    "save_decision",
+    "note_list",
+    "msg_challenge",
+    "msg_top",
+    "inline_search",
+    "inline_top",
+    "mixed",
+)
+
+
+class StubSession(BaseSession):
+    """Сессия Bot API без сети: на отправку и правку с chat_id — Message, на остальное — True."""
+    def __init__(self):
+        super().__init__()
+        self.calls: Counter = Counter()
+        self._message_id = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[type(method).__name__] += 1
+        result = True
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is not None and method.__returning__ in (Message, Message | bool):
+            self._message_id += 1
+            result = {
+                "message_id": getattr(method, "message_id", None) or self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": getattr(method, "text", None) or "",
+            }
+        content = self.json_dumps({"ok": True, "result": result})
+        return self.check_response(bot=bot, method=method, status_code=200, content=content).result
+
+    async def stream_content(self, *args, **kwargs):
+        # абстрактный в BaseSession; файлы бот не скачивает — пустой поток
+        return
+        yield
+
+    async def close(self):
+        pass
+
+
+# --- засев базы ---
+
+async def seed(db: Database, users: int, challenges: int, votes: int, saved: int, rnd: random.Random):
+    conn = db._conn
+    started = time.perf_counter()
+
+    await conn.executemany(
+        "INSERT INTO users (tg_id, username, first_name) VALUES (?, ?, ?)",
+        ((TG_ID_BASE + i, f"user{i}", f"U{i}") for i in range(1, users + 1)),
+    )
+    words = ["парсер", "бот", "мониторинг", "отчёт", "кэш", "планировщик", "CLI", "экспорт", "API", "SQLite"]
+    await conn.executemany(
+        "INSERT INTO challenges (title, body, tags) VALUES (?, ?, ?)",
+        (
+            (
+                f"{rnd.choice(words).capitalize()} #{i}",
+                " ".join(rnd.choices(words, k=12)),
+                " ".join(f"#{w}" for w in rnd.sample(words, 3)),
+            )
+            for i in range(challenges)
+        ),
+    )
+
+    # голоса без триггеров (по одному UPDATE challenges на строку — слишком долго),
+    # рейтинг потом пересчитывается одним запросом, триггеры создаются заново
+    for trigger in ("trg_votes_insert", "trg_votes_delete", "trg_votes_update"):
+        await conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    votes = min(votes, users * challenges)
+    await conn.execute(
+        """
+        WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i + 1 < ?1)
+        INSERT INTO votes (user_id, challenge_id, value)
+        SELECT i % ?2 + 1, (i / ?2 + i) % ?3 + 1, CASE WHEN i % 10 < 7 THEN 1 ELSE -1 END FROM n
+        """,
+        (votes, users, challenges),
+    )
+    await conn.execute(RECOUNT_SCORES_SQL)
+    await db.create_vote_triggers()
+
+    await conn.execute(
+        """
+        WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i + 1 < ?1)
+        INSERT OR IGNORE INTO saved (user_id, challenge_id, note, created_at)
+        SELECT i % ?2 + 1, (i * 7 + i / ?2) % ?3 + 1,
+               CASE WHEN i % 3 = 0 THEN 'заметка ' || i END,
+               datetime('now', '-' || (i % 100000) || ' seconds')
+        FROM n
+        """,
+        (saved, users, challenges),
+    )
+    await conn.commit()
+    logger.info(
+        f"База засеяна за {time.perf_counter() - started:.1f} с: "
+        f"{users} пользователей, {challenges} челленджей, {votes} голосов, {saved} сохранений"
+    )
+
+
+# --- апдейты ---
+
+class UpdateFactory:
+    def __init__(self, users: int, challenges: int, top_key: tuple[int, int], top_pages: int, rnd: random.Random):
+        self.users = users
+        self.challenges = challenges
+        self.top_key = top_key
+        self.top_pages = top_pages
+        self.rnd = rnd
+        # пользователи по кругу: у каждого мало событий, rate-limit не срабатывает
+        self._user_seq = itertools.cycle(range(1, users + 1))
+        self._update_id = itertools.count(1)
+
+    def _user(self):
+        uid = TG_ID_BASE + next(self._user_seq)
+        return {"id": uid, "is_bot": False, "first_name": "U"}, {"id": uid, "type": "private"}
+
+    def _callback(self, data: str) -> dict:
+        user, chat = self._user()
+        update_id = next(self._update_id)
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": user,
+                "chat_instance": str(user["id"]),
+                "data": data,
+                "message": {"message_id": 1, "date": 0, "chat": chat, "text": "card"},
+            },
+        }
+
+    def _message(self, text: str) -> dict:
+        user, chat = self._user()
+        update_id = next(self._update_id)
+        return {
+            "update_id": update_id,
+            "message": {"message_id": update_id, "date": 0, "chat": chat, "from": user, "text": text},
+        }
+
+    def _inline(self, query: str) -> dict:
+        user, _ = self._user()
+        update_id = next(self._update_id)
+        return {
+            "update_id": update_id,
+            "inline_query": {"id": str(update_id), "from": user, "query": query, "offset": ""},
+        }
+
+    def make(self, kind: str) -> dict:
+        if kind == "mixed":
+            kind = self.rnd.choice(KINDS[:-1])
+        cid = self.rnd.randint(1, self.challenges)
+        if kind == "vote":
+            return self._callback(encode_vote(cid, self.rnd.choice((1, -1))))
+        if kind == "new":
+            return self._callback(encode_new())
+        if kind == "page":
+            return self._callback(encode_page_seek("top", "f", 2, self.top_pages, self.top_key))
+        if kind == "save_decision":
+            return self._callback(encode_save_decision(cid, "n"))
+        if kind == "note_list":
+            return self._callback(encode_note_list())
+        if kind == "msg_challenge":
+            return self._message("/challenge")
+        if kind == "msg_top":
+            return self._message("/top")
+        if kind == "inline_search":
+            return self._inline(self.rnd.choice(["парсер", "бот мони", "кэш", "sqlite", "отчёт экспорт"]))
+        if kind == "inline_top":
+            return self._inline("")
+        raise ValueError(kind)
+
+
+# --- прогон ---
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_kind(dp, bot, updates: list[dict], concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    pending = iter(updates)
+
+    async def worker():
+        nonlocal errors
+        for raw in pending:
+            started = time.perf_counter()
+            try:
+                await dp.feed_raw_update(bot, raw)
+            except Exception:
+                errors += 1
+                logger.exception("Ошибка обработки апдейта")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "updates": len(updates),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "ups": round(len(updates) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(current: dict, baseline_path: str):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    logger.info(f"Сравнение с {baseline_path} (ревизия {baseline['meta'].get('revision')}):")
+    for kind, res in current["results"].items():
+        old = baseline["results"].get(kind)
+        if not old:
+            continue
+        logger.info(
+            f"  {kind:>14}: апд/с {old['ups']:>8} → {res['ups']:>8} ({res['ups'] / old['ups'] - 1:+.0%}), "
+            f"p95 {old['p95_ms']:>8} → {res['p95_ms']:>8} мс"
+        )
+
+
+async def main():
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Сквозной бенчмарк обработчиков")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--challenges", type=int, default=20_000)
+    parser.add_argument("--votes", type=int, default=1_000_000)
+    parser.add_argument("--saved", type=int, default=200_000)
+    parser.add_argument("--updates", type=int, default=2000, help="апдейтов на каждый вид")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--kinds", default=",".join(KINDS))
+    parser.add_argument("--db", help="путь к базе (по умолчанию — временная)")
+    parser.add_argument("--reuse", action="store_true", help="не засевать, если база --db уже есть")
+    parser.add_argument("--out", help="куда записать JSON (по умолчанию bench_results/e2e-<время>.json)")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # заглушка вместо Telegram — лимиты Bot API не нужны; правки не склеиваем, чтобы мерить их целиком
+    Config.BOT_TOKEN = Config.BOT_TOKEN or "123456:bench"
+    Config.OUTBOUND_GLOBAL_RPS = 0
+    from app.services.teleutil import edit_coalescer
+    from app.main import build_dispatcher, shutdown
+    edit_coalescer.window = 0
+
+    rnd = random.Random(args.seed)
+    tmp = None
+    path = args.db
+    if path is None:
+        tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp.name, "e2e.db")
+    fresh = not (args.reuse and os.path.exists(path))
+
+    db = Database(path)
+    await db.connect()
+    try:
+        if fresh:
+            await seed(db, args.users, args.challenges, args.votes, args.saved, rnd)
+        users = (await db.fetchone("SELECT COUNT(*) FROM users"))[0]
+        challenges = (await db.fetchone("SELECT MAX(id) FROM challenges"))[0]
+
+        crepo = ChallengeRepo(db)
+        first_page = await crepo.top_by_score_seek(PAGE_SIZE)
+        top_pages = max(2, ceil(await crepo.count_all() / PAGE_SIZE))
+        top_key = (first_page[-1][2], first_page[-1][0])
+
+        bot, dp = build_dispatcher(db)
+        bot.session = StubSession()
+        factory = UpdateFactory(users, challenges, top_key, top_pages, rnd)
+
+        results = {}
+        for kind in args.kinds.split(","):
+            updates = [factory.make(kind) for _ in range(args.updates)]
+            calls_before = bot.session.calls.copy()
+            res = await run_kind(dp, bot, updates, args.concurrency)
+            calls = bot.session.calls - calls_before
+            res["api_calls_per_update"] = round(sum(calls.values()) / len(updates), 2)
+            res["api_calls"] = dict(calls)
+            results[kind] = res
+            logger.info(
+                f"{kind:>14}: {res['ups']:>8} апд/с  p50 {res['p50_ms']:>7} мс  "
+                f"p95 {res['p95_ms']:>7} мс  p99 {res['p99_ms']:>7} мс  ошибок {res['errors']}"
+            )
+        await shutdown(dp, db)
+    except BaseException:
+        await db.close()
+        raise
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "users": users,
+            "challenges": challenges,
+            "votes": args.votes if fresh else None,
+            "saved": args.saved if fresh else None,
+            "updates_per_kind": args.updates,
+            "concurrency": args.concurrency,
+            "write_batching": Config.DB_WRITE_BATCHING,
+            "read_pool_size": Config.DB_READ_POOL_SIZE,
+            "metrics": Config.METRICS_ENABLED,
+        },
+        "results": results,
+    }
+    out = args.out or os.path.join("bench_results", f"e2e-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.success(f"Результаты: {out}")
+
+    if args.compare:
+        print_comparison(report, args.compare)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+Фейковый Bot API для нагрузочных прогонов: отвечает как Telegram, но локально,
+и, как настоящий, отдаёт 429 retry_after при превышении лимитов отправки.
+
+Бот направляется сюда через TELEGRAM_API_URL=http://127.0.0.1:8081.
+"""
+import asyncio
+import time
+from collections import Counter
+
+from aiohttp import web
+
+from app.middlewares.ratelimit import GCRALimiter
+
+# методы, на которые распространяются лимиты отправки
+LIMITED = {"sendMessage", "editMessageText", "editMessageReplyMarkup", "deleteMessage"}
+
+
+class FakeTelegram:
+    def __init__(self, global_rps: int = 30, chat_rps: float = 1, chat_burst: int = 3, latency_ms: float = 0):
+        self.latency = latency_ms / 1000
+        self._global = GCRALimiter(1, global_rps)
+        self._chats = GCRALimiter(chat_burst / chat_rps, chat_burst)
+        self._message_id = 0
+
+        self.calls: Counter = Counter()
+        self.first_call: dict[str, float] = {}  # метод → time.monotonic() первого вызова
+        self.throttled: Counter = Counter()
+        self.updates: asyncio.Queue = asyncio.Queue()  # для getUpdates
+
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner: web.AppRunner | None = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081) -> str:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        form = await request.post()
+        self.calls[method] += 1
+        self.first_call.setdefault(method, time.monotonic())
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method in LIMITED:
+            now = time.monotonic()
+            chat = form.get("chat_id") or form.get("inline_message_id")
+            if not self._global.hit(0, now) or not self._chats.hit(hash(chat), now):
+                self.throttled[method] += 1
+                return web.json_response({
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests: retry after 1",
+                    "parameters": {"retry_after": 1},
+                })
+
+        return web.json_response({"ok": True, "result": await self.result(method, form)})
+
+    async def result(self, method: str, form):
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        if method == "getUpdates":
+            timeout = float(form.get("timeout") or 0)
+            try:
+                first = await asyncio.wait_for(self.updates.get(), timeout=timeout or 0.01)
+            except asyncio.TimeoutError:
+                return []
+            batch = [first]
+            while not self.updates.empty():
+                batch.append(self.updates.get_nowait())
+            return batch
+        if method in ("sendMessage", "editMessageText") and form.get("chat_id"):
+            chat_id = int(form["chat_id"])
+            self._message_id += 1
+            return {
+                "message_id": int(form.get("message_id") or self._message_id),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+                "text": form.get("text", ""),
+            }
+        return True
@@ -0,0 +1,103 @@
+"""
+Исходящие запросы с планировщиком и без: всплеск правок, ответов на нажатия
+и сообщений в десятки чатов против фейкового Bot API с лимитами как у Telegram.
+
+    python -m bench.outbound --chats 40 --port 8081
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.logger_config import setup_logging
+from app.middlewares.outbound import OutboundScheduler
+from bench.fake_telegram import FakeTelegram
+
+TOKEN = "123456:bench"
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1] if len(values) > 1 else values[0]
+
+
+async def workload(bot: Bot, chats: int):
+    latencies: dict[str, list[float]] = {"answer": [], "send": [], "edit": []}
+    failed = 0
+
+    async def timed(kind, coro):
+        nonlocal failed
+        start = time.perf_counter()
+        try:
+            await coro
+        except TelegramRetryAfter:
+            failed += 1
+            return
+        latencies[kind].append(time.perf_counter() - start)
+
+    jobs = []
+    for chat in range(1, chats + 1):
+        for i in range(8):  # пользователь листает список / голосует
+            jobs.append(timed("answer", bot.answer_callback_query(f"{chat}-{i}")))
+            jobs.append(timed("edit", bot.edit_message_text(f"page {i}", chat_id=chat, message_id=1)))
+        jobs.append(timed("send", bot.send_message(chat, "hello")))
+    for i in range(12):  # популярная карточка в inline-режиме (в боте правки ещё и склеиваются)
+        jobs.append(timed("edit", bot.edit_message_text(f"score {i}", inline_message_id="hot")))
+
+    start = time.perf_counter()
+    await asyncio.gather(*jobs)
+    return latencies, failed, time.perf_counter() - start
+
+
+async def run(url: str, chats: int, scheduled: bool, logger):
+    fake = FakeTelegram()
+    await fake.start(*url.removeprefix("http://").split(":"))
+    session = AiohttpSession(api=TelegramAPIServer.from_base(url))
+    scheduler = None
+    if scheduled:
+        scheduler = OutboundScheduler()
+        session.middleware(scheduler)
+    bot = Bot(token=TOKEN, session=session)
+
+    try:
+        latencies, failed, elapsed = await workload(bot, chats)
+    finally:
+        if scheduler is not None:
+            await scheduler.close()
+        await bot.session.close()
+        await fake.stop()
+
+    label = "с планировщиком" if scheduled else "напрямую"
+    logger.info(
+        f"{label}: {elapsed:.2f} с, 429 от API: {sum(fake.throttled.values())}, "
+        f"потеряно запросов: {failed}"
+    )
+    for kind, values in latencies.items():
+        logger.info(
+            f"  {kind:>6}: n={len(values):4d} p50={percentile(values, 50) * 1000:7.1f} мс "
+            f"p95={percentile(values, 95) * 1000:7.1f} мс"
+        )
+    if scheduler is not None:
+        logger.info(f"  очередь: {scheduler.stats()}")
+
+
+async def main():
+    logger = setup_logging()
+    parser = argparse.ArgumentParser(description="Бенчмарк планировщика исходящих запросов")
+    parser.add_argument("--chats", type=int, default=40)
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}"
+    for scheduled in (False, True):
+        await run(url, args.chats, scheduled, logger)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+"""
+Холодный старт: запускает бота (python -m app.main) против фейкового Bot API
+с одним /challenge в очереди getUpdates и меряет время от запуска процесса
+до первого getUpdates и до ответа на этот апдейт (time-to-first-update).
+Первый прогон — на базе без схемы (миграции), остальные — на готовой.
+
+    python -m bench.startup --runs 3
+    python -m bench.startup --runs 3 --supervisor 2
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from app.logger_config import setup_logging
+from app.storage.db import Database
+from bench.e2e import seed
+from bench.fake_telegram import FakeTelegram
+
+TOKEN = "123456:bench"
+
+
+def challenge_update(update_id: int) -> dict:
+    user = {"id": 42, "is_bot": False, "first_name": "U"}
+    return {
+        "update_id": update_id,
+        "message": {"message_id": 1, "date": 0, "chat": {"id": 42, "type": "private"}, "from": user, "text": "/challenge"},
+    }
+
+
+async def seed_catalog(path: str, challenges: int):
+    db = Database(path)
+    await db.connect()
+    try:
+        await seed(db, users=100, challenges=challenges, votes=challenges * 10, saved=1000, rnd=random.Random(1))
+    finally:
+        await db.close()
+
+
+async def measure(env: dict, port: int, update_id: int, timeout: float) -> dict:
+    # новый фейковый API на каждый прогон: незавершённый getUpdates прошлого процесса
+    # иначе забрал бы апдейт из общей очереди
+    fake = FakeTelegram(global_rps=1_000_000, chat_rps=1_000_000)
+    env = dict(env, TELEGRAM_API_URL=await fake.start("127.0.0.1", port))
+    fake.updates.put_nowait(challenge_update(update_id))
+
+    started = time.monotonic()
+    bot = subprocess.Popen([sys.executable, "-m", "app.main"], env=env, stdout=subprocess.DEVNULL)
+    try:
+        deadline = started + timeout
+        while "sendMessage" not in fake.first_call and time.monotonic() < deadline:
+            await asyncio.sleep(0.005)
+        if "sendMessage" not in fake.first_call:
+            raise RuntimeError(f"бот не ответил за {timeout:.0f} с")
+        return {
+            "first_poll": fake.first_call.get("getUpdates", 0) - started,
+            "first_update": fake.first_call["sendMessage"] - started,
+        }
+    finally:
+        bot.terminate()
+        bot.wait(timeout=30)
+        await fake.stop()
+
+
+async def main():
+    logger = setup_logging()
+    parser = argparse.ArgumentParser(description="Время холодного старта бота")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--challenges", type=int, default=20_000, help="челленджей в базе (для прогрева)")
+    parser.add_argument("--supervisor", type=int, default=0, help="воркеров за супервизором (SUPERVISOR_WORKERS)")
+    parser.add_argument("--api-port", type=int, default=8093)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    db_path = os.path.join(tmp.name, "startup.db")
+    env = dict(
+        os.environ,
+        BOT_TOKEN=TOKEN,
+        DB_PATH=db_path,
+        RUN_MODE="polling",
+        OUTBOUND_GLOBAL_RPS="0",
+        SUPERVISOR_WORKERS=str(args.supervisor),
+    )
+
+    try:
+        for run in range(args.runs):
+            if run == 1:
+                # первый прогон создал схему на пустой базе; дальше — каталог и рестарты
+                await seed_catalog(db_path, args.challenges)
+            res = await measure(env, args.api_port, run + 1, args.timeout)
+            kind = "пустая база, миграции" if run == 0 else "готовая схема"
+            logger.info(
+                f"Прогон {run + 1} ({kind}): первый getUpdates через {res['first_poll']:.2f} с, "
+                f"ответ на первый апдейт через {res['first_update']:.2f} с"
+            )
+    finally:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
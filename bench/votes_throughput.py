@@ -0,0 +1,93 @@
+"""
+Пропускная способность голосования: голосов в секунду без группового коммита и с ним.
+
+    python -m bench.votes_throughput --votes 5000 --concurrency 64
+
+Каждый «клик» — VoteRepo.toggle (как в обработчике 👍/👎): повторный голос
+с тем же значением снимает его. На отдельной временной базе в режиме WAL.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from loguru import logger
+
+from app.logger_config import setup_logging
+from app.config import Config
+from app.storage.db import Database
+from app.storage.repositories.vote_repo import VoteRepo
+
+
+async def run_once(path: str, batching: bool, votes: int, concurrency: int, users: int, challenges: int) -> float:
+    db = Database(path, write_batching=batching)
+    await db.connect()
+    try:
+        await db._conn.executemany(
+            "INSERT INTO users (tg_id, username, first_name) VALUES (?, '', '')",
+            [(i,) for i in range(1, users + 1)],
+        )
+        await db._conn.executemany(
+            "INSERT INTO challenges (title, body, tags) VALUES (?, 'body', 'bench')",
+            [(f"bench #{i}",) for i in range(challenges)],
+        )
+        await db._conn.commit()
+
+        vrepo = VoteRepo(db)
+        rnd = random.Random(42)
+        clicks = [(rnd.randint(1, users), rnd.randint(1, challenges), rnd.choice((1, -1))) for _ in range(votes)]
+        queue = asyncio.Queue()
+        for click in clicks:
+            queue.put_nowait(click)
+
+        async def worker():
+            while not queue.empty():
+                uid, cid, val = queue.get_nowait()
+                await vrepo.toggle(uid, cid, val)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+        mismatches = await vrepo.find_score_mismatches(limit=1)
+        if mismatches:
+            logger.error(f"Рейтинг разошёлся с votes: {mismatches}")
+        if db.batcher is not None:
+            logger.info(
+                f"  пачек: {db.batcher.batches}, в среднем {db.batcher.statements / max(1, db.batcher.batches):.1f} записей"
+            )
+        return votes / elapsed
+    finally:
+        await db.close()
+
+
+async def main():
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Голосов в секунду: обычный commit против группового")
+    parser.add_argument("--votes", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--challenges", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=Config.DB_BATCH_MAX_SIZE)
+    parser.add_argument("--interval-ms", type=float, default=Config.DB_BATCH_INTERVAL_MS)
+    args = parser.parse_args()
+
+    Config.DB_BATCH_MAX_SIZE = args.batch_size
+    Config.DB_BATCH_INTERVAL_MS = args.interval_ms
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for batching in (False, True):
+            path = os.path.join(tmp, f"votes_{int(batching)}.db")
+            results[batching] = await run_once(
+                path, batching, args.votes, args.concurrency, args.users, args.challenges
+            )
+            logger.info(f"batching={batching}: {results[batching]:.0f} голосов/с")
+
+    logger.success(f"Ускорение: x{results[True] / results[False]:.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,158 @@
+"""
+Нагрузка на webhook-режим без Telegram: поднимает фейковый Bot API и бота
+(RUN_MODE=webhook, WEBHOOK_WORKERS процессов на одной базе), шлёт синтетические
+апдейты POST-запросами и ждёт, пока бот ответит на каждый.
+
+    python -m bench.webhook_load --users 500 --workers 2
+    python -m bench.webhook_load --users 500 --supervisor 4
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from app.config import Config
+from app.keyboards.callbacks import encode_vote
+from app.logger_config import setup_logging
+from app.storage.db import Database
+from app.storage.repositories.challenge_repo import ChallengeRepo
+from bench.fake_telegram import FakeTelegram
+
+TOKEN = "123456:bench"
+SECRET = "bench-secret"
+CHALLENGES = 200
+VOTES_PER_USER = 3
+
+
+async def seed(path: str):
+    db = Database(path)
+    await db.connect()
+    try:
+        repo = ChallengeRepo(db)
+        for i in range(CHALLENGES):
+            await repo.create(f"Челлендж {i}", f"Описание {i}", "#bench")
+    finally:
+        await db.close()
+
+
+def make_updates(users: int) -> list[dict]:
+    updates = []
+    for uid in range(1, users + 1):
+        user = {"id": uid, "is_bot": False, "first_name": f"U{uid}"}
+        chat = {"id": uid, "type": "private"}
+        updates.append({
+            "update_id": len(updates) + 1,
+            "message": {"message_id": 1, "date": 0, "chat": chat, "from": user, "text": "/challenge"},
+        })
+        for v in range(VOTES_PER_USER):
+            updates.append({
+                "update_id": len(updates) + 1,
+                "callback_query": {
+                    "id": f"{uid}-{v}",
+                    "from": user,
+                    "chat_instance": str(uid),
+                    "data": encode_vote((uid * 7 + v) % CHALLENGES + 1, 1 if v % 2 == 0 else -1),
+                    "message": {"message_id": 1, "date": 0, "chat": chat, "text": "card"},
+                },
+            })
+    return updates
+
+
+async def wait_port(port: int, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"бот не открыл порт {port}")
+
+
+async def main():
+    logger = setup_logging()
+    parser = argparse.ArgumentParser(description="Нагрузка на webhook-режим")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=1, help="процессов на одном порту (WEBHOOK_WORKERS)")
+    parser.add_argument("--supervisor", type=int, default=0, help="воркеров за супервизором (SUPERVISOR_WORKERS)")
+    parser.add_argument("--concurrency", type=int, default=64, help="одновременных POST-запросов")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--api-port", type=int, default=8091)
+    args = parser.parse_args()
+
+    Config.CALLBACK_SECRET = SECRET
+    tmp = tempfile.TemporaryDirectory()
+    db_path = os.path.join(tmp.name, "bench.db")
+    await seed(db_path)
+
+    fake = FakeTelegram(global_rps=1_000_000, chat_rps=1_000_000)
+    api_url = await fake.start("127.0.0.1", args.api_port)
+
+    env = dict(
+        os.environ,
+        BOT_TOKEN=TOKEN,
+        DB_PATH=db_path,
+        CALLBACK_SECRET=SECRET,
+        TELEGRAM_API_URL=api_url,
+        OUTBOUND_GLOBAL_RPS="0",  # меряем приём и обработку, а не лимиты Telegram
+        RUN_MODE="webhook",
+        WEBHOOK_HOST="127.0.0.1",
+        WEBHOOK_PORT=str(args.port),
+        WEBHOOK_URL="",
+        WEBHOOK_WORKERS=str(args.workers),
+        SUPERVISOR_WORKERS=str(args.supervisor),
+    )
+    bot = subprocess.Popen([sys.executable, "-m", "app.main"], env=env, stdout=subprocess.DEVNULL)
+
+    try:
+        await wait_port(args.port)
+        updates = make_updates(args.users)
+        messages = args.users
+        votes = len(updates) - messages
+
+        url = f"http://127.0.0.1:{args.port}{Config.WEBHOOK_PATH}"
+        queue: asyncio.Queue = asyncio.Queue()
+        for update in updates:
+            queue.put_nowait(update)
+
+        async def sender(session: aiohttp.ClientSession):
+            while not queue.empty():
+                update = queue.get_nowait()
+                async with session.post(url, json=update) as resp:
+                    resp.raise_for_status()
+
+        start = time.perf_counter()
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(sender(session) for _ in range(args.concurrency)))
+        accepted = time.perf_counter() - start
+
+        # обработано = бот ответил: sendMessage на /challenge, answerCallbackQuery на голос
+        deadline = time.monotonic() + 120
+        while (fake.calls["sendMessage"] < messages or fake.calls["answerCallbackQuery"] < votes) \
+                and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+        processed = time.perf_counter() - start
+
+        mode = f"супервизор + {args.supervisor} воркеров" if args.supervisor > 1 else f"воркеров: {args.workers}"
+        logger.info(f"Апдейтов: {len(updates)} ({messages} /challenge, {votes} голосов), {mode}")
+        logger.info(f"Приняты за {accepted:.2f} с — {len(updates) / accepted:,.0f} апд/с")
+        logger.info(
+            f"Обработаны за {processed:.2f} с — {len(updates) / processed:,.0f} апд/с "
+            f"(sendMessage {fake.calls['sendMessage']}, answerCallbackQuery {fake.calls['answerCallbackQuery']}, "
+            f"editMessageText {fake.calls['editMessageText']})"
+        )
+    finally:
+        bot.terminate()
+        bot.wait(timeout=30)
+        await fake.stop()
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())